@@ -0,0 +1,312 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import inspect
+import logging
+import importlib
+import importlib.util
+import importlib.machinery
+from datetime import datetime, timezone
+import boto3
+from botocore.exceptions import ClientError
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+
+# --- Adaptive Check Scheduling ---
+# Runs a health check (step5, healthcheck or the lambda-python monitor) and picks
+# the next check interval from the recent healthy-percentage trajectory:
+#   - below HEALTHY_THRESHOLD_PERCENTAGE, or within THRESHOLD_PROXIMITY_PERCENTAGE
+#     of it: MIN_CHECK_INTERVAL_SECONDS
+#   - falling: half the projected time to reach the threshold
+#   - steady at 100%: the interval doubles each run, up to MAX_CHECK_INTERVAL_SECONDS
+#   - otherwise: DEFAULT_CHECK_INTERVAL_SECONDS
+#
+# ADAPTIVE_SCHEDULE_MODE selects how the next check runs:
+#   reschedule - update a one-time EventBridge Scheduler schedule (at(...)) that invokes
+#                this function again with the recent history in its input
+#   loop       - sleep and check again inside this invocation while the Lambda
+#                timeout allows (or ADAPTIVE_LOOP_MAX_SECONDS without a Lambda
+#                context); the history carries over between warm invocations
+# The loop mode is billed for every second it sleeps, so a function with a
+# 15-minute timeout costs about as much as checking continuously; it only saves
+# invocations. Prefer the reschedule mode when the goal is lower cost, and use the
+# loop mode for sub-minute intervals that at() schedules cannot express.
+# Keep a fixed-rate rule at MAX_CHECK_INTERVAL_SECONDS as a watchdog: if a reschedule
+# fails, the next watchdog run restarts the chain. Watchdog runs (events without
+# 'adaptive_history') do nothing while the one-time schedule is still pending, and
+# otherwise restart from the history in its input.
+
+ADAPTIVE_CHECK_HANDLER = os.environ.get('ADAPTIVE_CHECK_HANDLER', 'step5')
+ADAPTIVE_SCHEDULE_MODE = os.environ.get('ADAPTIVE_SCHEDULE_MODE', 'reschedule').lower()
+HEALTHY_THRESHOLD_PERCENTAGE = float(os.environ.get('HEALTHY_THRESHOLD_PERCENTAGE', '75'))
+THRESHOLD_PROXIMITY_PERCENTAGE = float(os.environ.get('THRESHOLD_PROXIMITY_PERCENTAGE', '10'))
+MIN_CHECK_INTERVAL_SECONDS = int(os.environ.get('MIN_CHECK_INTERVAL_SECONDS', '60')) # at() schedules have minute granularity
+DEFAULT_CHECK_INTERVAL_SECONDS = int(os.environ.get('DEFAULT_CHECK_INTERVAL_SECONDS', '120'))
+MAX_CHECK_INTERVAL_SECONDS = int(os.environ.get('MAX_CHECK_INTERVAL_SECONDS', '900'))
+STEADY_SAMPLES = int(os.environ.get('STEADY_SAMPLES', '3')) # Consecutive 100% results before backing off
+HISTORY_LENGTH = int(os.environ.get('ADAPTIVE_HISTORY_LENGTH', '10'))
+
+# EventBridge Scheduler settings for the reschedule mode
+SCHEDULE_NAME = os.environ.get('ADAPTIVE_SCHEDULE_NAME', 'adaptive-health-check')
+SCHEDULE_GROUP_NAME = os.environ.get('ADAPTIVE_SCHEDULE_GROUP_NAME', 'default')
+SCHEDULER_ROLE_ARN = os.environ.get('SCHEDULER_ROLE_ARN') # Role EventBridge Scheduler assumes to invoke this function
+SCHEDULER_TARGET_ARN = os.environ.get('SCHEDULER_TARGET_ARN') # Defaults to the invoked function ARN
+
+# Time kept back from the Lambda deadline in the loop mode
+DEADLINE_SAFETY_MARGIN_SECONDS = 5.0
+# Loop mode limit when there is no Lambda context to bound it (local or harness runs)
+ADAPTIVE_LOOP_MAX_SECONDS = float(os.environ.get('ADAPTIVE_LOOP_MAX_SECONDS', '900'))
+
+# A one-time schedule this recently due may still be invoking the next check
+WATCHDOG_GRACE_SECONDS = 60.0
+
+SCHEDULE_MODES = ('reschedule', 'loop')
+
+# Check aliases: (module, function, file name for modules that cannot be imported by name)
+CHECK_HANDLERS = {
+    'step5': ('step5', 'handler', None),
+    'healthcheck': ('healthcheck', 'lambda_handler', None),
+    'lambda-python': ('lambda_python', 'lambda_handler', 'lambda-python'),
+}
+
+scheduler_client = boto3.client('scheduler')
+
+# Per-execution-environment state for the loop mode
+_history = []
+
+# --- Helper Functions ---
+
+def resolve_check_handler(check_handler):
+    """
+    Returns the handler for a CHECK_HANDLERS alias or a 'module:function' string.
+    """
+    module_name, function_name, file_name = CHECK_HANDLERS.get(check_handler, (None, None, None))
+    if module_name is None:
+        module_name, _, function_name = check_handler.partition(':')
+        if not function_name:
+            raise ValueError(f"ADAPTIVE_CHECK_HANDLER '{check_handler}' must be one of {sorted(CHECK_HANDLERS)} or 'module:function'.")
+    if file_name is None:
+        return getattr(importlib.import_module(module_name), function_name)
+    if module_name not in sys.modules:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), file_name)
+        loader = importlib.machinery.SourceFileLoader(module_name, path)
+        module = importlib.util.module_from_spec(importlib.util.spec_from_loader(module_name, loader))
+        sys.modules[module_name] = module
+        loader.exec_module(module)
+    return getattr(sys.modules[module_name], function_name)
+
+def extract_healthy_percentage(result):
+    """
+    Reads the healthy percentage from a check handler's response: 'healthy_percentage'
+    (step5, lambda-python) or the actual/published binary result (healthcheck).
+    Falls back to the status code: 100 for 200, 0 otherwise.
+    """
+    try:
+        body = json.loads(result.get('body') or 'null')
+    except (TypeError, ValueError):
+        body = None
+    if isinstance(body, dict):
+        if body.get('healthy_percentage') is not None:
+            return float(str(body['healthy_percentage']).rstrip('%'))
+        for key in ('actual_health_check_result', 'published_binary_health_value'):
+            if body.get(key) is not None:
+                return float(body[key]) * 100.0
+    return 100.0 if result.get('statusCode') == 200 else 0.0
+
+def choose_next_interval(history, threshold_percentage=HEALTHY_THRESHOLD_PERCENTAGE):
+    """
+    Returns (interval_seconds, reason) for the next check. history is a list of
+    {'t': epoch seconds, 'p': healthy percentage, 'i': interval chosen} records,
+    oldest first, ending with the check that just ran.
+    """
+    current = history[-1]['p']
+    if current < threshold_percentage:
+        return MIN_CHECK_INTERVAL_SECONDS, 'below_threshold'
+    if current - threshold_percentage <= THRESHOLD_PROXIMITY_PERCENTAGE:
+        return MIN_CHECK_INTERVAL_SECONDS, 'near_threshold'
+
+    if len(history) >= 2:
+        first, last = history[max(0, len(history) - 4)], history[-1]
+        elapsed = last['t'] - first['t']
+        slope = (last['p'] - first['p']) / elapsed if elapsed > 0 else 0.0 # Percentage points per second
+        if slope < 0:
+            seconds_to_threshold = (current - threshold_percentage) / -slope
+            # Check at least twice before the trend would cross the threshold
+            return int(min(DEFAULT_CHECK_INTERVAL_SECONDS, max(MIN_CHECK_INTERVAL_SECONDS, seconds_to_threshold / 2))), 'falling'
+
+    recent = history[-STEADY_SAMPLES:]
+    if len(recent) >= STEADY_SAMPLES and all(entry['p'] >= 100.0 for entry in recent):
+        previous_interval = history[-2].get('i') or DEFAULT_CHECK_INTERVAL_SECONDS
+        return int(min(MAX_CHECK_INTERVAL_SECONDS, max(DEFAULT_CHECK_INTERVAL_SECONDS, previous_interval * 2))), 'steady'
+    return DEFAULT_CHECK_INTERVAL_SECONDS, 'default'
+
+def run_check(check, event, context):
+    """
+    Runs one check and returns (status_code, healthy_percentage). A failed check
+    counts as 0% healthy so the next one comes quickly.
+    """
+    try:
+        result = check(event, context)
+        if inspect.iscoroutine(result):
+            result = asyncio.run(result)
+        return result.get('statusCode', 500), extract_healthy_percentage(result)
+    except Exception as e:
+        logger.error(f"Health check '{ADAPTIVE_CHECK_HANDLER}' failed: {e}", exc_info=True)
+        return 500, 0.0
+
+def reschedule(next_check_at, history, context):
+    """
+    Points the one-time EventBridge Scheduler schedule at the next check, passing
+    the history in the target input. Creates the schedule on first use.
+    """
+    target_arn = SCHEDULER_TARGET_ARN or getattr(context, 'invoked_function_arn', None)
+    if not target_arn or not SCHEDULER_ROLE_ARN:
+        raise ValueError("The reschedule mode needs SCHEDULER_ROLE_ARN and SCHEDULER_TARGET_ARN (or a Lambda context).")
+    schedule = {
+        'Name': SCHEDULE_NAME,
+        'GroupName': SCHEDULE_GROUP_NAME,
+        'ScheduleExpression': f"at({next_check_at.strftime('%Y-%m-%dT%H:%M:%S')})",
+        'ScheduleExpressionTimezone': 'UTC',
+        'FlexibleTimeWindow': {'Mode': 'OFF'},
+        'Target': {
+            'Arn': target_arn,
+            'RoleArn': SCHEDULER_ROLE_ARN,
+            'Input': json.dumps({'adaptive_history': history})
+        },
+        'State': 'ENABLED'
+    }
+    try:
+        scheduler_client.update_schedule(**schedule)
+    except scheduler_client.exceptions.ResourceNotFoundException:
+        scheduler_client.create_schedule(**schedule)
+    logger.info(f"Next '{ADAPTIVE_CHECK_HANDLER}' check scheduled for {next_check_at.isoformat()} via schedule '{SCHEDULE_NAME}'.")
+
+def get_pending_schedule():
+    """
+    Reads the one-time schedule for a watchdog run. Returns (next_check_at, history):
+    next_check_at is set while the schedule is enabled and due in the future (or
+    within WATCHDOG_GRACE_SECONDS), and history is recovered from its input. Both
+    are empty when the schedule is missing or unreadable.
+    """
+    try:
+        schedule = scheduler_client.get_schedule(Name=SCHEDULE_NAME, GroupName=SCHEDULE_GROUP_NAME)
+    except scheduler_client.exceptions.ResourceNotFoundException:
+        return None, []
+    except ClientError as e:
+        logger.warning(f"Could not read schedule '{SCHEDULE_NAME}'; running the check: {e}")
+        return None, []
+
+    try:
+        history = json.loads(schedule.get('Target', {}).get('Input') or '{}').get('adaptive_history') or []
+    except (TypeError, ValueError, AttributeError):
+        history = []
+    expression = schedule.get('ScheduleExpression', '')
+    if schedule.get('State') != 'ENABLED' or not (expression.startswith('at(') and expression.endswith(')')):
+        return None, history
+    try:
+        next_check_at = datetime.strptime(expression[3:-1], '%Y-%m-%dT%H:%M:%S').replace(tzinfo=timezone.utc) # reschedule() writes UTC
+    except ValueError:
+        return None, history
+    if next_check_at.timestamp() + WATCHDOG_GRACE_SECONDS <= time.time():
+        return None, history
+    return next_check_at, history
+
+# --- Main Lambda Handler ---
+
+def handler(event, context):
+    """
+    Lambda entry point: runs ADAPTIVE_CHECK_HANDLER, then schedules the next run at
+    an interval chosen from the recent health trajectory.
+    """
+    global _history
+    event = event or {}
+
+    if ADAPTIVE_SCHEDULE_MODE not in SCHEDULE_MODES:
+        logger.error(f"Invalid ADAPTIVE_SCHEDULE_MODE '{ADAPTIVE_SCHEDULE_MODE}'. Expected one of {SCHEDULE_MODES}.")
+        return {
+            'statusCode': 400,
+            'body': json.dumps(f"Error: Invalid ADAPTIVE_SCHEDULE_MODE '{ADAPTIVE_SCHEDULE_MODE}'.")
+        }
+    try:
+        check = resolve_check_handler(ADAPTIVE_CHECK_HANDLER)
+    except (ValueError, ImportError, AttributeError) as e:
+        logger.error(f"Invalid ADAPTIVE_CHECK_HANDLER: {e}")
+        return {
+            'statusCode': 400,
+            'body': json.dumps(f'Error: Invalid ADAPTIVE_CHECK_HANDLER: {e}')
+        }
+
+    # The schedule input carries the history in the reschedule mode; the loop mode keeps it in memory
+    history = event.get('adaptive_history') if ADAPTIVE_SCHEDULE_MODE == 'reschedule' else _history
+    if ADAPTIVE_SCHEDULE_MODE == 'reschedule' and 'adaptive_history' not in event:
+        # Watchdog run: leave a healthy chain alone, otherwise restart it where it stopped
+        pending_check_at, history = get_pending_schedule()
+        if pending_check_at is not None:
+            logger.info(f"Watchdog: next '{ADAPTIVE_CHECK_HANDLER}' check already scheduled for {pending_check_at.isoformat()}; nothing to do.")
+            return {
+                'statusCode': 200,
+                'body': json.dumps({
+                    'check_handler': ADAPTIVE_CHECK_HANDLER,
+                    'schedule_mode': ADAPTIVE_SCHEDULE_MODE,
+                    'checks_run': 0,
+                    'next_check_at': pending_check_at.isoformat(),
+                    'rescheduled': False
+                })
+            }
+    history = list(history or [])[-HISTORY_LENGTH:]
+    check_event = {key: value for key, value in event.items() if key != 'adaptive_history'}
+    started = time.monotonic()
+    checks_run = 0
+
+    while True:
+        check_started = time.monotonic()
+        status_code, healthy_percentage = run_check(check, check_event, context)
+        checks_run += 1
+        check_seconds = time.monotonic() - check_started
+
+        history.append({'t': int(time.time()), 'p': round(healthy_percentage, 2), 'i': None})
+        interval_seconds, reason = choose_next_interval(history)
+        history[-1]['i'] = interval_seconds
+        history = history[-HISTORY_LENGTH:]
+        logger.info(f"Check '{ADAPTIVE_CHECK_HANDLER}': {healthy_percentage:.2f}% healthy; next check in {interval_seconds}s ({reason}).")
+
+        if ADAPTIVE_SCHEDULE_MODE == 'reschedule':
+            break
+        if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+            remaining_seconds = context.get_remaining_time_in_millis() / 1000.0
+        else:
+            remaining_seconds = ADAPTIVE_LOOP_MAX_SECONDS - (time.monotonic() - started)
+        if remaining_seconds - DEADLINE_SAFETY_MARGIN_SECONDS < interval_seconds + check_seconds:
+            break
+        time.sleep(interval_seconds)
+
+    _history = history
+    next_check_at = datetime.fromtimestamp(time.time() + interval_seconds, timezone.utc)
+    rescheduled = None
+    if ADAPTIVE_SCHEDULE_MODE == 'reschedule':
+        try:
+            reschedule(next_check_at, history, context)
+            rescheduled = True
+        except (ClientError, ValueError) as e:
+            # The fixed-rate watchdog rule restarts the chain
+            logger.error(f"Failed to schedule the next check: {e}")
+            rescheduled = False
+
+    return {
+        'statusCode': status_code,
+        'body': json.dumps({
+            'check_handler': ADAPTIVE_CHECK_HANDLER,
+            'schedule_mode': ADAPTIVE_SCHEDULE_MODE,
+            'checks_run': checks_run,
+            'healthy_percentage': f"{healthy_percentage:.2f}%",
+            'next_check_in_seconds': interval_seconds,
+            'next_check_reason': reason,
+            'next_check_at': next_check_at.isoformat(),
+            'rescheduled': rescheduled,
+            'elapsed_seconds': round(time.monotonic() - started, 2)
+        })
+    }
@@ -0,0 +1,53 @@
+import os
+import time
+import argparse
+import functools
+
+# sharded_runner imports step5, which creates its boto3 clients at import time;
+# they need a region even though every call here goes to the simulated backend
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+from simulated_backend import SimulatedFleet, SimulatedElbv2Client
+from sharded_runner import run_sharded, merge_shard_results
+
+# --- Benchmark: sharded runner scaling against the simulated backend ---
+# Usage: python bench_sharded_runner.py --target-groups 400 --targets-per-group 200
+
+def make_simulated_client(fleet, latency_seconds):
+    return SimulatedElbv2Client(fleet, latency_seconds)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure sharded health runner throughput from 1 to N worker processes.")
+    parser.add_argument('--albs', type=int, default=30)
+    parser.add_argument('--target-groups', type=int, default=400, help="Total target groups across all ALBs.")
+    parser.add_argument('--targets-per-group', type=int, default=200)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Injected per-call latency.")
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    fleet = SimulatedFleet(
+        alb_count=args.albs,
+        target_groups_per_alb=max(1, args.target_groups // args.albs),
+        targets_per_group=args.targets_per_group,
+        unhealthy_fraction=0.05
+    )
+    target_group_arns = fleet.target_group_arns
+    client_factory = functools.partial(make_simulated_client, fleet, args.latency_ms / 1000.0)
+
+    print(f"{len(target_group_arns)} target groups x {args.targets_per_group} targets, {args.latency_ms}ms injected latency")
+    print(f"{'workers':>8} {'best_s':>10} {'tg_per_s':>10} {'speedup':>8}")
+
+    baseline = None
+    for worker_count in range(1, args.max_workers + 1):
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            summary = merge_shard_results(run_sharded(target_group_arns, worker_count, client_factory), 75.0)
+            timings.append(time.perf_counter() - started)
+        best = min(timings)
+        baseline = baseline or best
+        print(f"{worker_count:>8} {best:>10.3f} {summary['total_target_groups'] / best:>10.1f} {baseline / best:>7.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -4,13 +4,18 @@ import logging
 import boto3
 from botocore.exceptions import ClientError
 
+from request_coalescing import coalescing_client, reset_invocation_cache
+from structured_logging import LazyJson, RunSummary
+from metric_publisher import MetricPublisher, publisher_client_config
+
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
 
 # Initialize AWS SDK clients
-elbv2_client = boto3.client('elbv2')
-cloudwatch_client = boto3.client('cloudwatch')
+elbv2_client = coalescing_client(boto3.client('elbv2')) # Identical describe calls are shared per invocation
+cloudwatch_client = boto3.client('cloudwatch', config=publisher_client_config)
+metric_publisher = MetricPublisher(cloudwatch_client) # Sends in the background; drained before the handler returns
 
 async def get_load_balancer_arn(load_balancer_name):
     """
@@ -89,9 +94,9 @@ async def check_target_group_health(target_group_arn):
                 unhealthy_targets.append({'Id': target_id, 'Port': target_port, 'Status': status, 'Reason': target['TargetHealth'].get('Reason', 'N/A')})
 
         # Log detailed status for debugging
-        logger.debug(f"Target Group '{target_group_arn}' health check: {'Healthy' if is_healthy else 'Unhealthy'}")
-        logger.debug(f"  Healthy targets: {healthy_targets}")
-        logger.debug(f"  Unhealthy targets: {unhealthy_targets}")
+        logger.debug("Target Group '%s' health check: %s", target_group_arn, 'Healthy' if is_healthy else 'Unhealthy')
+        logger.debug("  Healthy targets: %s", healthy_targets)
+        logger.debug("  Unhealthy targets: %s", unhealthy_targets)
 
         return {
             'isHealthy': is_healthy,
@@ -106,29 +111,27 @@ async def check_target_group_health(target_group_arn):
 
 async def publish_metric(metric_name, value, namespace, unit):
     """
-    Publishes a custom metric to CloudWatch.
+    Queues a custom metric for the background publisher; failures are reported
+    by the publisher and never fail the health check itself.
     """
-    try:
-        cloudwatch_client.put_metric_data(
-            Namespace=namespace,
-            MetricData=[
-                {
-                    'MetricName': metric_name,
-                    'Value': value,
-                    'Unit': unit
-                },
-            ]
-        )
-        logger.info(f"Published metric '{metric_name}' with value {value} to namespace '{namespace}'")
-    except ClientError as e:
-        logger.error(f"Error publishing metric '{metric_name}': {e}")
-        # Don't re-raise, as metric publishing should ideally not fail the health check itself
+    metric_publisher.put(
+        namespace,
+        [
+            {
+                'MetricName': metric_name,
+                'Value': value,
+                'Unit': unit
+            },
+        ]
+    )
+    logger.info(f"Queued metric '{metric_name}' with value {value} for namespace '{namespace}'")
 
 async def handler(event, context):
     """
     Lambda function to check the health status of ALB target groups
     and publish custom CloudWatch metrics for Route 53 health checks.
     """
+    reset_invocation_cache() # Start every invocation with fresh describe results
     load_balancer_name = os.environ.get('LOAD_BALANCER_NAME')
     health_threshold_percentage = float(os.environ.get('HEALTH_THRESHOLD_PERCENTAGE', '80'))
     health_check_namespace = os.environ.get('HEALTH_CHECK_NAMESPACE', 'MyApp/HealthChecks')
@@ -138,8 +141,12 @@ async def handler(event, context):
         logger.error("LOAD_BALANCER_NAME environment variable is not set.")
         await publish_metric("OverallApplicationHealthPercentage", 0, health_check_namespace, 'Percent')
         await publish_metric("BinaryApplicationHealthStatus", 0, health_check_namespace, 'Count')
+        metric_publisher.flush()
         return { 'statusCode': 500, 'body': json.dumps('Load Balancer name not configured.') }
 
+    summary = RunSummary('code.handler') # Emitted once as a single JSON record
+    summary.set(alb_name=load_balancer_name, threshold_percentage=health_threshold_percentage)
+
     try:
         target_group_arns = await get_target_group_arns_from_alb(load_balancer_name)
 
@@ -147,6 +154,7 @@ async def handler(event, context):
         if total_target_groups_found == 0:
             logger.warn(f"No target groups found for ALB '{load_balancer_name}'. Overall health considered 0% for failover purposes.")
             overall_health_percentage = 0.0
+            summary.set(total_target_groups=0, overall_health_percentage=overall_health_percentage, binary_health_status=0)
             await publish_metric("OverallApplicationHealthPercentage", overall_health_percentage, health_check_namespace, 'Percent')
             await publish_metric("BinaryApplicationHealthStatus", 0, health_check_namespace, 'Count')
             return { 'statusCode': 200, 'body': json.dumps('Health check completed. No target groups found.') }
@@ -159,14 +167,21 @@ async def handler(event, context):
             all_target_group_statuses[arn] = health_status
             if health_status['isHealthy']:
                 healthy_target_groups_count += 1
+            else:
+                summary.append('unhealthy_target_groups', arn)
 
         overall_health_percentage = (healthy_target_groups_count / total_target_groups_found) * 100.0
 
-        logger.info(f"Overall application health: {overall_health_percentage:.2f}% ({healthy_target_groups_count}/{total_target_groups_found} healthy target groups).")
-        logger.debug(f"Detailed target group statuses: {json.dumps(all_target_group_statuses, indent=2)}")
+        logger.debug("Detailed target group statuses: %s", LazyJson(all_target_group_statuses))
 
         await publish_metric("OverallApplicationHealthPercentage", overall_health_percentage, health_check_namespace, 'Percent')
         binary_health_status = 1 if overall_health_percentage >= health_threshold_percentage else 0
+        summary.set(
+            total_target_groups=total_target_groups_found,
+            healthy_target_groups=healthy_target_groups_count,
+            overall_health_percentage=round(overall_health_percentage, 2),
+            binary_health_status=binary_health_status
+        )
         await publish_metric("BinaryApplicationHealthStatus", binary_health_status, health_check_namespace, 'Count')
 
         # The Lambda's return statusCode determines the health for Route 53 (if it's a direct endpoint health check)
@@ -179,6 +194,10 @@ async def handler(event, context):
 
     except Exception as e:
         logger.error(f"An unhandled error occurred in Lambda handler: {e}", exc_info=True) # exc_info to print traceback
+        summary.set(error=str(e), binary_health_status=0)
         await publish_metric("OverallApplicationHealthPercentage", 0, health_check_namespace, 'Percent')
         await publish_metric("BinaryApplicationHealthStatus", 0, health_check_namespace, 'Count')
         return { 'statusCode': 500, 'body': json.dumps(f'Lambda execution failed: {str(e)}') }
+    finally:
+        summary.set(**metric_publisher.flush())
+        summary.emit()
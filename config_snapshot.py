@@ -0,0 +1,170 @@
+import json
+import hashlib
+import logging
+from collections import namedtuple
+from types import MappingProxyType
+from urllib.parse import urlsplit
+
+# Configure logging
+logger = logging.getLogger()
+
+# --- Compiled Configuration Snapshots ---
+# JSON configuration (CLOUDWATCH_DIMENSIONS, CLUSTERS_AND_SERVICES_TO_MONITOR, the
+# service endpoints SSM parameter) is validated once and compiled into immutable
+# structures. Results are cached by content hash, so warm invocations with
+# unchanged configuration skip parsing and validation entirely.
+
+# CloudWatch PutMetricData limits
+MAX_DIMENSIONS = 30
+MAX_DIMENSION_NAME_LENGTH = 255
+MAX_DIMENSION_VALUE_LENGTH = 1024
+
+DEFAULT_PROBE_TIMEOUT_SECONDS = 5.0
+MAX_PROBE_TIMEOUT_SECONDS = 30.0
+
+MAX_CACHED_SNAPSHOTS = 32
+
+ServiceEndpoint = namedtuple('ServiceEndpoint', ['name', 'url', 'timeout_seconds'])
+MonitoredServices = namedtuple('MonitoredServices', ['services_by_cluster', 'skipped_entries'])
+
+class ConfigError(ValueError):
+    """
+    Raised when configuration fails validation. The message names the setting
+    and the offending element.
+    """
+
+_compiled_cache = {}
+
+def _compile_cached(kind, content, compiler, *args):
+    """
+    Returns the compiled form of content, compiling it only the first time a
+    given (kind, content hash, args) combination is seen.
+    """
+    key = (kind, hashlib.sha256(content.encode('utf-8')).hexdigest(), args)
+    compiled = _compiled_cache.get(key)
+    if compiled is None:
+        compiled = compiler(content, *args)
+        if len(_compiled_cache) >= MAX_CACHED_SNAPSHOTS:
+            _compiled_cache.clear()
+        _compiled_cache[key] = compiled
+    return compiled
+
+def _load_json_array(content, setting_name):
+    try:
+        value = json.loads(content)
+    except json.JSONDecodeError as e:
+        raise ConfigError(f"{setting_name} is not valid JSON: {e.msg} at line {e.lineno} column {e.colno}.")
+    if not isinstance(value, list):
+        raise ConfigError(f"{setting_name} must be a JSON array, got {type(value).__name__}.")
+    return value
+
+def _require_string(entry, key, location, max_length=None):
+    value = entry.get(key)
+    if not isinstance(value, str) or not value.strip():
+        raise ConfigError(f"{location}.{key} must be a non-empty string.")
+    if max_length is not None and len(value) > max_length:
+        raise ConfigError(f"{location}.{key} exceeds {max_length} characters.")
+    return value.strip()
+
+# --- CLOUDWATCH_DIMENSIONS ---
+
+def _compile_dimensions(content, setting_name):
+    if not content.strip():
+        return ()
+    entries = _load_json_array(content, setting_name)
+    if len(entries) > MAX_DIMENSIONS:
+        raise ConfigError(f"{setting_name} has {len(entries)} dimensions; CloudWatch allows at most {MAX_DIMENSIONS}.")
+
+    dimensions = []
+    seen_names = set()
+    for index, entry in enumerate(entries):
+        location = f"{setting_name}[{index}]"
+        if not isinstance(entry, dict):
+            raise ConfigError(f"{location} must be an object with 'Name' and 'Value'.")
+        name = _require_string(entry, 'Name', location, MAX_DIMENSION_NAME_LENGTH)
+        value = _require_string(entry, 'Value', location, MAX_DIMENSION_VALUE_LENGTH)
+        if name in seen_names:
+            raise ConfigError(f"{location}.Name '{name}' is duplicated.")
+        seen_names.add(name)
+        dimensions.append({'Name': name, 'Value': value})
+    return tuple(dimensions)
+
+def compile_dimensions(content, setting_name='CLOUDWATCH_DIMENSIONS'):
+    """
+    Compiles a JSON array of {"Name", "Value"} objects into a tuple of dimension
+    dicts ready for PutMetricData. An empty string means no dimensions.
+    The result is shared between invocations and must not be mutated.
+    """
+    return _compile_cached('dimensions', content or '', _compile_dimensions, setting_name)
+
+# --- CLUSTERS_AND_SERVICES_TO_MONITOR ---
+
+def _compile_monitored_services(content, setting_name):
+    grouped = {}
+    skipped_entries = []
+    for index, entry in enumerate(_load_json_array(content or '[]', setting_name)):
+        location = f"{setting_name}[{index}]"
+        # A malformed entry is skipped so it cannot stop the other services being monitored
+        try:
+            if not isinstance(entry, dict):
+                raise ConfigError(f"{location} must be an object with 'cluster_name' and 'service_name'.")
+            cluster_name = _require_string(entry, 'cluster_name', location)
+            service_name = _require_string(entry, 'service_name', location)
+            services = grouped.setdefault(cluster_name, [])
+            if service_name in services:
+                raise ConfigError(f"{location} duplicates service '{service_name}' in cluster '{cluster_name}'.")
+        except ConfigError as e:
+            skipped_entries.append(str(e))
+            continue
+        services.append(service_name)
+    services_by_cluster = MappingProxyType({cluster_name: tuple(services) for cluster_name, services in grouped.items()})
+    return MonitoredServices(services_by_cluster, tuple(skipped_entries))
+
+def compile_monitored_services(content, setting_name='CLUSTERS_AND_SERVICES_TO_MONITOR'):
+    """
+    Compiles the monitored ECS services into a MonitoredServices record: a read-only
+    mapping of cluster_name -> tuple of service names (names or ARNs), preserving
+    configuration order, and the validation errors of the entries that were skipped.
+    Raises ConfigError only when the value is not a JSON array.
+    """
+    return _compile_cached('monitored_services', content or '[]', _compile_monitored_services, setting_name)
+
+# --- Service health endpoints (SSM) ---
+
+def _compile_service_endpoints(content, setting_name, default_timeout_seconds):
+    entries = _load_json_array(content, setting_name)
+    if not entries:
+        raise ConfigError(f"{setting_name} must contain at least one service endpoint.")
+
+    endpoints = []
+    for index, entry in enumerate(entries):
+        location = f"{setting_name}[{index}]"
+        if not isinstance(entry, dict):
+            raise ConfigError(f"{location} must be an object with 'name' and 'url'.")
+        name = entry.get('name') or 'unknown-service'
+        url = _require_string(entry, 'url', location)
+
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise ConfigError(f"{location}.url '{url}' must use http or https.")
+        if not parts.hostname:
+            raise ConfigError(f"{location}.url '{url}' has no host.")
+        try:
+            parts.port # Raises for a non-numeric or out-of-range port
+        except ValueError:
+            raise ConfigError(f"{location}.url '{url}' has an invalid port.")
+
+        timeout_seconds = entry.get('timeout', default_timeout_seconds)
+        if isinstance(timeout_seconds, bool) or not isinstance(timeout_seconds, (int, float)) or not (0 < timeout_seconds <= MAX_PROBE_TIMEOUT_SECONDS):
+            raise ConfigError(f"{location}.timeout must be a number of seconds between 0 and {MAX_PROBE_TIMEOUT_SECONDS}.")
+
+        endpoints.append(ServiceEndpoint(str(name), url, float(timeout_seconds)))
+    return tuple(endpoints)
+
+def compile_service_endpoints(content, setting_name='SERVICE_HEALTH_ENDPOINTS_SSM_PATH', default_timeout_seconds=DEFAULT_PROBE_TIMEOUT_SECONDS):
+    """
+    Compiles the service endpoint JSON array into a tuple of ServiceEndpoint
+    records with validated URLs and per-endpoint probe timeouts
+    ("timeout" in seconds, defaulting to default_timeout_seconds).
+    """
+    return _compile_cached('service_endpoints', content or '', _compile_service_endpoints, setting_name, float(default_timeout_seconds))
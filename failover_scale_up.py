@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import BotoCoreError, ClientError
+
+import failover_warmup
+from failover_warmup import (
+    secondary_ecs_client,
+    secondary_elbv2_client,
+    timed_call,
+    ECS_DESCRIBE_SERVICES_BATCH_SIZE,
+    MAX_POOL_CONNECTIONS,
+    SECONDARY_AWS_REGION
+)
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+
+# --- Environment Variables ---
+# '[{"cluster_name": "my-cluster", "service_name": "my-service", "desired_count": 4}]'
+SERVICES_TO_SCALE_UP = os.environ.get('SERVICES_TO_SCALE_UP', '[]')
+READINESS_FRACTION = float(os.environ.get('READINESS_FRACTION', '1.0'))
+READINESS_POLL_INTERVAL_SECONDS = float(os.environ.get('READINESS_POLL_INTERVAL_SECONDS', '5'))
+READINESS_TIMEOUT_SECONDS = float(os.environ.get('READINESS_TIMEOUT_SECONDS', '600'))
+CHECK_TARGET_HEALTH = os.environ.get('CHECK_TARGET_HEALTH', 'false').lower() == 'true'
+
+# Time kept back from the Lambda deadline to build and return the response
+DEADLINE_SAFETY_MARGIN_SECONDS = 5.0
+
+# --- Helper Functions ---
+
+def parse_scale_up_targets(services):
+    """
+    Validates scale-up entries and returns them as dicts with cluster_name,
+    service_name and an integer desired_count.
+    """
+    if not isinstance(services, list):
+        raise ValueError(f"Scale-up services must be a list of entries, got {type(services).__name__}.")
+    targets = []
+    for service_config in services:
+        if not isinstance(service_config, dict):
+            raise ValueError(f"Scale-up entry {service_config!r} must be an object.")
+        cluster_name = service_config.get('cluster_name')
+        service_name = service_config.get('service_name')
+        desired_count = service_config.get('desired_count')
+        if not cluster_name or not service_name or desired_count is None:
+            raise ValueError(f"Scale-up entry {service_config} must define cluster_name, service_name and desired_count.")
+        # bool is an int subclass; floats are only accepted when they are whole numbers
+        if isinstance(desired_count, bool) or not (isinstance(desired_count, int) or (isinstance(desired_count, float) and desired_count.is_integer())):
+            raise ValueError(f"Scale-up entry {service_config} has a non-integer desired_count.")
+        if desired_count < 0:
+            raise ValueError(f"Scale-up entry {service_config} has a negative desired_count.")
+        targets.append({'cluster_name': cluster_name, 'service_name': service_name, 'desired_count': int(desired_count)})
+    return targets
+
+def update_service_desired_count(target):
+    """
+    Issues UpdateService for one service. Returns an error message, or None on success.
+    """
+    try:
+        timed_call(
+            secondary_ecs_client,
+            'update_service',
+            cluster=target['cluster_name'],
+            service=target['service_name'],
+            desiredCount=target['desired_count']
+        )
+        logger.info(f"Requested desiredCount={target['desired_count']} for service '{target['service_name']}' in cluster '{target['cluster_name']}'.")
+        return None
+    except ClientError as e:
+        logger.error(f"AWS API Error updating service '{target['service_name']}' in cluster '{target['cluster_name']}': {e}")
+        return str(e)
+    except BotoCoreError as e:
+        # Connection or endpoint failures for one service must not abort the others
+        logger.error(f"Error calling UpdateService for service '{target['service_name']}' in cluster '{target['cluster_name']}': {e}")
+        return str(e)
+
+def scale_up_services(targets):
+    """
+    Issues UpdateService for every target concurrently over the pooled secondary-region
+    connections. Returns {(cluster_name, service_name): error_or_None}.
+    """
+    if not targets:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(len(targets), MAX_POOL_CONNECTIONS)) as executor:
+        errors = list(executor.map(update_service_desired_count, targets))
+    return {(target['cluster_name'], target['service_name']): error for target, error in zip(targets, errors)}
+
+def describe_service_counts(targets):
+    """
+    Describes the target services, batched per cluster in groups of 10.
+    Returns {(cluster_name, service_name): service_description}. A batch that fails
+    (throttling, ClusterNotFound, a connection error) is logged and left out, so
+    its services count as not ready yet and are described again on the next poll.
+    """
+    services_by_cluster = {}
+    for target in targets:
+        services_by_cluster.setdefault(target['cluster_name'], []).append(target['service_name'])
+
+    descriptions = {}
+    for cluster_name, service_names in services_by_cluster.items():
+        for i in range(0, len(service_names), ECS_DESCRIBE_SERVICES_BATCH_SIZE):
+            batch = service_names[i:i + ECS_DESCRIBE_SERVICES_BATCH_SIZE]
+            try:
+                response = timed_call(secondary_ecs_client, 'describe_services', cluster=cluster_name, services=batch)
+            except (ClientError, BotoCoreError) as e:
+                logger.warning(f"Could not describe services {batch} in cluster '{cluster_name}'; treating them as not ready: {e}")
+                continue
+            for service in response.get('services', []):
+                descriptions[(cluster_name, service['serviceName'])] = service
+    return descriptions
+
+def has_healthy_target(target_group_arn):
+    """
+    Returns True if the target group has at least one healthy target; False
+    (not ready yet) when its health cannot be read.
+    """
+    try:
+        response = timed_call(secondary_elbv2_client, 'describe_target_health', TargetGroupArn=target_group_arn)
+    except (ClientError, BotoCoreError) as e:
+        logger.warning(f"Could not describe target health for '{target_group_arn}'; treating it as not ready: {e}")
+        return False
+    return any(d['TargetHealth']['State'] == 'healthy' for d in response.get('TargetHealthDescriptions', []))
+
+def is_service_ready(target, service, check_target_health):
+    """
+    A service is ready when runningCount has reached the requested desired count
+    and, optionally, every target group it is registered with has a healthy target.
+    """
+    if service is None or service.get('runningCount', 0) < target['desired_count']:
+        return False
+    if check_target_health:
+        target_group_arns = [lb['targetGroupArn'] for lb in service.get('loadBalancers', []) if 'targetGroupArn' in lb]
+        return all(has_healthy_target(tg_arn) for tg_arn in target_group_arns)
+    return True
+
+def wait_for_readiness(targets, readiness_fraction, deadline, poll_interval_seconds, check_target_health=False):
+    """
+    Polls service counts until at least readiness_fraction of the targets are
+    ready or the deadline (time.monotonic() based) passes. Services that are
+    already ready are not described again.
+    """
+    pending = {(target['cluster_name'], target['service_name']): target for target in targets}
+    ready = {}
+    required_ready = readiness_fraction * len(targets)
+    polls = 0
+
+    while True:
+        polls += 1
+        descriptions = describe_service_counts(list(pending.values()))
+        for key, target in list(pending.items()):
+            service = descriptions.get(key)
+            if is_service_ready(target, service, check_target_health):
+                ready[key] = service.get('runningCount', 0)
+                del pending[key]
+
+        logger.info(f"Readiness poll {polls}: {len(ready)}/{len(targets)} services ready (need {readiness_fraction:.0%}).")
+        if len(ready) >= required_ready or not pending:
+            break
+        if time.monotonic() + poll_interval_seconds > deadline:
+            logger.warning(f"Readiness deadline reached with {len(pending)} services still scaling.")
+            break
+        time.sleep(poll_interval_seconds)
+
+    return {
+        'ready': sorted(f"{cluster_name}/{service_name}" for cluster_name, service_name in ready),
+        'pending': sorted(f"{cluster_name}/{service_name}" for cluster_name, service_name in pending),
+        'ready_fraction': len(ready) / len(targets) if targets else 1.0,
+        'polls': polls
+    }
+
+# --- Main Lambda Handler ---
+
+def handler(event, context):
+    """
+    FailoverProcessLambda: scales the secondary region's ECS services to their
+    operational capacity and returns as soon as READINESS_FRACTION of them are
+    running, instead of relying on a fixed Step Functions Wait state.
+    A {"warmup": true} event is forwarded to the connection warm-up ping.
+    """
+    event = event or {}
+    if event.get('warmup'):
+        return failover_warmup.handler(event, context)
+
+    try:
+        targets = parse_scale_up_targets(event.get('services') or json.loads(SERVICES_TO_SCALE_UP))
+        readiness_fraction = float(event.get('readiness_fraction', READINESS_FRACTION))
+        if not (0 < readiness_fraction <= 1):
+            raise ValueError("READINESS_FRACTION must be greater than 0 and at most 1.")
+    except (ValueError, json.JSONDecodeError) as e:
+        logger.error(f"Invalid scale-up configuration: {e}")
+        return {
+            'statusCode': 400,
+            'body': json.dumps(f'Error: Invalid scale-up configuration: {e}')
+        }
+
+    if not targets:
+        logger.warning("No services configured for scale-up.")
+        return {
+            'statusCode': 200,
+            'body': json.dumps({'message': 'No services configured for scale-up.', 'ready_fraction': 1.0})
+        }
+
+    started = time.monotonic()
+    deadline = started + READINESS_TIMEOUT_SECONDS
+    if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+        deadline = min(deadline, started + context.get_remaining_time_in_millis() / 1000.0 - DEADLINE_SAFETY_MARGIN_SECONDS)
+
+    try:
+        logger.info(f"Scaling up {len(targets)} services in {SECONDARY_AWS_REGION}.")
+        update_errors = {key: error for key, error in scale_up_services(targets).items() if error}
+        # Services whose update failed stay in the readiness set: they may already be at capacity
+        readiness = wait_for_readiness(
+            targets,
+            readiness_fraction,
+            deadline,
+            READINESS_POLL_INTERVAL_SECONDS,
+            CHECK_TARGET_HEALTH
+        )
+
+        ready_fraction = len(readiness['ready']) / len(targets)
+        is_ready = ready_fraction >= readiness_fraction
+        elapsed_seconds = time.monotonic() - started
+        logger.info(f"Scale-up finished in {elapsed_seconds:.1f}s: {len(readiness['ready'])}/{len(targets)} services ready.")
+
+        return {
+            'statusCode': 200 if is_ready else 500,
+            'body': json.dumps({
+                'message': f"Secondary region scale-up {'reached' if is_ready else 'did not reach'} the readiness target.",
+                'region': SECONDARY_AWS_REGION,
+                'ready_fraction': ready_fraction,
+                'readiness_target': readiness_fraction,
+                'ready_services': readiness['ready'],
+                'pending_services': readiness['pending'],
+                'update_errors': {f"{cluster_name}/{service_name}": error for (cluster_name, service_name), error in update_errors.items()},
+                'readiness_polls': readiness['polls'],
+                'elapsed_seconds': round(elapsed_seconds, 2)
+            })
+        }
+    except Exception as e:
+        logger.error(f"Secondary region scale-up failed: {e}", exc_info=True)
+        return {
+            'statusCode': 500,
+            'body': json.dumps(f'Internal Server Error: {e}')
+        }
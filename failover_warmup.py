@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import logging
+import threading
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+
+# --- Environment Variables ---
+SECONDARY_AWS_REGION = os.environ.get('SECONDARY_AWS_REGION', 'us-west-2')
+# Same shape as CLUSTERS_AND_SERVICES_TO_MONITOR:
+# '[{"cluster_name": "my-cluster", "service_name": "my-service"}]'
+SECONDARY_ECS_SERVICES = os.environ.get('SECONDARY_ECS_SERVICES', '[]')
+# Off by default: importing this module (as failover_scale_up does) then makes no network calls
+WARM_ON_INIT = os.environ.get('WARM_ON_INIT', 'false').lower() == 'true'
+WARM_ON_INIT_TIMEOUT_SECONDS = float(os.environ.get('WARM_ON_INIT_TIMEOUT_SECONDS', '3'))
+MAX_POOL_CONNECTIONS = int(os.environ.get('MAX_POOL_CONNECTIONS', '20'))
+# Bounded so an unreachable secondary region fails fast instead of 60s per attempt
+SECONDARY_CONNECT_TIMEOUT_SECONDS = float(os.environ.get('SECONDARY_CONNECT_TIMEOUT_SECONDS', '2'))
+SECONDARY_READ_TIMEOUT_SECONDS = float(os.environ.get('SECONDARY_READ_TIMEOUT_SECONDS', '10'))
+
+# --- Secondary Region Clients ---
+# Created once per execution environment with TCP keep-alive and a pool large
+# enough for parallel failover calls. A scheduled ping keeps the pooled TLS
+# connections open so the failover path does not pay DNS + TLS handshakes.
+secondary_client_config = Config(
+    region_name=SECONDARY_AWS_REGION,
+    tcp_keepalive=True,
+    max_pool_connections=MAX_POOL_CONNECTIONS,
+    connect_timeout=SECONDARY_CONNECT_TIMEOUT_SECONDS,
+    read_timeout=SECONDARY_READ_TIMEOUT_SECONDS,
+    retries={'max_attempts': 3, 'mode': 'standard'}
+)
+secondary_ecs_client = boto3.client('ecs', config=secondary_client_config)
+secondary_elbv2_client = boto3.client('elbv2', config=secondary_client_config)
+secondary_cloudwatch_client = boto3.client('cloudwatch', config=secondary_client_config)
+
+ECS_DESCRIBE_SERVICES_BATCH_SIZE = 10 # DescribeServices accepts at most 10 services per call
+
+# Per-execution-environment state
+_call_latencies = {} # 'service.operation' -> {'cold_ms': float, 'warm_ms': float, 'calls': int}
+_call_latencies_lock = threading.Lock() # timed_call runs on the scale-up thread pool
+_secondary_topology = None
+
+# --- Helper Functions ---
+
+def timed_call(client, operation_name, **kwargs):
+    """
+    Calls a client operation and records its latency. The first call of an
+    operation in this execution environment is recorded as cold, later ones as warm.
+    """
+    key = f"{client.meta.service_model.service_name}.{operation_name}"
+    started = time.perf_counter()
+    try:
+        return getattr(client, operation_name)(**kwargs)
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        with _call_latencies_lock:
+            stats = _call_latencies.setdefault(key, {'cold_ms': None, 'warm_ms': None, 'calls': 0})
+            if stats['calls'] == 0:
+                stats['cold_ms'] = round(elapsed_ms, 2)
+            else:
+                stats['warm_ms'] = round(elapsed_ms, 2)
+            stats['calls'] += 1
+
+def get_call_latencies():
+    """
+    Returns a copy of the recorded cold/warm latencies per operation.
+    """
+    with _call_latencies_lock:
+        return {key: dict(stats) for key, stats in _call_latencies.items()}
+
+def warm_connections(deadline=None):
+    """
+    Opens (or refreshes) pooled connections to the secondary region's ECS, ELBv2
+    and CloudWatch endpoints with the cheapest read call each service offers.
+    Calls not yet started when deadline (time.monotonic() based) passes are skipped.
+    """
+    priming_calls = [
+        (secondary_ecs_client, 'list_clusters', {'maxResults': 1}),
+        (secondary_elbv2_client, 'describe_load_balancers', {'PageSize': 1}),
+        (secondary_cloudwatch_client, 'describe_alarms', {'MaxRecords': 1}),
+    ]
+    for client, operation_name, kwargs in priming_calls:
+        if deadline is not None and time.monotonic() >= deadline:
+            logger.warning(f"Warm-up of {SECONDARY_AWS_REGION} stopped at its time limit before {operation_name}.")
+            break
+        try:
+            timed_call(client, operation_name, **kwargs)
+        except ClientError as e:
+            # Even an AccessDenied response leaves a warm TLS connection behind
+            logger.warning(f"Warm-up call {operation_name} in {SECONDARY_AWS_REGION} returned an error: {e}")
+    return get_call_latencies()
+
+def parse_secondary_services(services_json):
+    """
+    Parses SECONDARY_ECS_SERVICES into {cluster_name: [service_name, ...]}.
+    """
+    grouped = {}
+    for service_config in json.loads(services_json):
+        cluster_name = service_config.get('cluster_name')
+        service_name = service_config.get('service_name')
+        if not cluster_name or not service_name:
+            logger.warning(f"Skipping malformed service configuration: {service_config}. Missing cluster_name or service_name.")
+            continue
+        grouped.setdefault(cluster_name, []).append(service_name)
+    return grouped
+
+def resolve_secondary_topology(force_refresh=False):
+    """
+    Resolves and caches the secondary side: per cluster, each service's ARN,
+    desired/running counts and the target groups it is registered with.
+    """
+    global _secondary_topology
+    if _secondary_topology is not None and not force_refresh:
+        return _secondary_topology
+
+    topology = {}
+    for cluster_name, service_names in parse_secondary_services(SECONDARY_ECS_SERVICES).items():
+        cluster_topology = topology.setdefault(cluster_name, {})
+        for i in range(0, len(service_names), ECS_DESCRIBE_SERVICES_BATCH_SIZE):
+            batch = service_names[i:i + ECS_DESCRIBE_SERVICES_BATCH_SIZE]
+            response = timed_call(secondary_ecs_client, 'describe_services', cluster=cluster_name, services=batch)
+            for service in response.get('services', []):
+                cluster_topology[service['serviceName']] = {
+                    'serviceArn': service['serviceArn'],
+                    'desiredCount': service.get('desiredCount', 0),
+                    'runningCount': service.get('runningCount', 0),
+                    'targetGroupArns': [lb['targetGroupArn'] for lb in service.get('loadBalancers', []) if 'targetGroupArn' in lb]
+                }
+            for failure in response.get('failures', []):
+                logger.warning(f"Secondary service lookup failed in cluster '{cluster_name}': {failure.get('arn')} ({failure.get('reason')})")
+
+    _secondary_topology = topology
+    return topology
+
+def get_secondary_topology():
+    """
+    Returns the cached secondary topology, resolving it on first use.
+    """
+    return resolve_secondary_topology()
+
+# --- Init-phase warm-up ---
+# Opt-in (WARM_ON_INIT=true): runs during Lambda init so the first real failover call
+# is already hot. It is capped at WARM_ON_INIT_TIMEOUT_SECONDS in total, so an
+# unreachable secondary region cannot use up the init budget when failover is needed;
+# calls still in flight at the limit finish in the background.
+def _warm_on_init():
+    try:
+        warm_connections(deadline=time.monotonic() + WARM_ON_INIT_TIMEOUT_SECONDS)
+    except Exception as e:
+        logger.warning(f"Init-phase warm-up of {SECONDARY_AWS_REGION} clients failed: {e}")
+
+if WARM_ON_INIT:
+    _warm_up_thread = threading.Thread(target=_warm_on_init, name='secondary-warm-up', daemon=True)
+    _warm_up_thread.start()
+    _warm_up_thread.join(WARM_ON_INIT_TIMEOUT_SECONDS)
+    if _warm_up_thread.is_alive():
+        logger.warning(f"Init-phase warm-up of {SECONDARY_AWS_REGION} clients did not finish within {WARM_ON_INIT_TIMEOUT_SECONDS:g}s; continuing without it.")
+
+# --- Main Lambda Handler ---
+
+def handler(event, context):
+    """
+    Scheduled keep-alive ping: re-primes the pooled secondary-region connections,
+    refreshes the cached topology and reports cold vs warm call latency.
+    """
+    try:
+        warm_connections()
+        topology = resolve_secondary_topology(force_refresh=True)
+        latencies = get_call_latencies()
+        logger.info(f"Secondary region '{SECONDARY_AWS_REGION}' warm-up complete. Latencies: {json.dumps(latencies)}")
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'message': f"Secondary region '{SECONDARY_AWS_REGION}' connections warmed.",
+                'clusters': {cluster_name: sorted(services) for cluster_name, services in topology.items()},
+                'latencies_ms': latencies
+            })
+        }
+    except Exception as e:
+        logger.error(f"Secondary region warm-up failed: {e}", exc_info=True)
+        return {
+            'statusCode': 500,
+            'body': json.dumps(f'Internal Server Error: {e}')
+        }
@@ -0,0 +1,360 @@
+import os
+import sys
+import time
+import asyncio
+import cProfile
+import inspect
+import logging
+import argparse
+import pstats
+import importlib
+import threading
+import functools
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from structured_logging import LazyJson
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+# Profile records use their own logger: the profiled module resets the root level on import
+profile_logger = logging.getLogger('handler_profiling')
+profile_logger.setLevel(logging.INFO)
+
+# --- Handler Profiling ---
+# Opt-in profiling of a handler's init (module import, client creation) and invoke
+# phases, recorded separately. Enable with HANDLER_PROFILING:
+#   off       - default; handlers run unwrapped
+#   cprofile  - deterministic profile of the calling thread, written as .prof (pstats)
+#               and as collapsed stacks rebuilt from the call graph (microseconds)
+#   sampling  - wall-clock stack sampler over every thread, written as collapsed
+#               stacks ("root;caller;callee count")
+# Collapsed stacks load into flamegraph.pl and speedscope.
+# Each phase logs one JSON record with the top-N hotspots by self time and the
+# share of self time spent in botocore model loading, response parsing and network I/O.
+#
+# In Lambda, set the function handler to handler_profiling.handler and PROFILED_HANDLER
+# to the real handler (e.g. step5.handler); the real module is then imported under
+# the init profile. Locally: python handler_profiling.py step5 --mode sampling
+
+HANDLER_PROFILING = os.environ.get('HANDLER_PROFILING', 'off').lower()
+PROFILED_HANDLER = os.environ.get('PROFILED_HANDLER', '') # 'module.function'
+HANDLER_PROFILE_DIR = os.environ.get('HANDLER_PROFILE_DIR', '/tmp/handler-profiles')
+HANDLER_PROFILE_TOP_N = int(os.environ.get('HANDLER_PROFILE_TOP_N', '15'))
+HANDLER_PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get('HANDLER_PROFILE_SAMPLE_INTERVAL_MS', '2'))
+
+PROFILING_MODES = ('off', 'cprofile', 'sampling')
+
+# Self time is attributed to the first category whose path fragment matches the frame's file
+HOTSPOT_CATEGORIES = (
+    ('botocore_model_loading', ('botocore/loaders.py', 'botocore/model.py', 'botocore/session.py', 'botocore/client.py', 'botocore/regions.py')),
+    ('response_parsing', ('botocore/parsers.py', 'json/', 'simulated_backend.py')),
+    ('network_io', ('ssl.py', 'socket.py', 'urllib3/', 'http/client.py', 'requests/')),
+    ('module_imports', ('<frozen importlib', 'importlib/')),
+)
+
+# Leaf frames of threads parked waiting for work; dropped from samples of every
+# thread except the profiled one, whose waits (e.g. draining metrics) are its wall time
+IDLE_LEAF_FRAMES = {
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('queue.py', 'get'),
+    ('selectors.py', 'select'),
+    ('thread.py', '_worker'),
+    ('socketserver.py', 'serve_forever'),
+}
+
+_profile_sequence = Counter() # (label, phase) -> profiles written by this process
+
+def categorize(filename):
+    normalized = filename.replace(os.sep, '/')
+    for category, fragments in HOTSPOT_CATEGORIES:
+        if any(fragment in normalized for fragment in fragments):
+            return category
+    return 'other'
+
+def format_frame(filename, function_name, line_number):
+    return f"{function_name} ({os.path.basename(filename)}:{line_number})"
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of every thread (except its own) at a fixed interval,
+    starting as soon as the caller resumes after start() and once more on stop.
+    Stacks are stored root first as tuples of (filename, function, first line).
+    The thread that called start() is the profiled thread: its blocking waits are
+    kept, while its samples inside start() or stop() are dropped.
+
+    While sampling, the interpreter's thread switch interval is lowered to half the
+    sampling interval: with the default 5 ms, CPU-bound code would hold the GIL
+    through several intervals and a short invoke could end without a sample.
+    """
+
+    def __init__(self, interval_seconds):
+        self.interval_seconds = interval_seconds
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._resumed = threading.Event()
+        self._thread = None
+        self._profiled_thread_id = None
+        self._switch_interval = None
+
+    def start(self):
+        self._profiled_thread_id = threading.get_ident()
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, max(self.interval_seconds / 2.0, 1e-4)))
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+        self._thread.start()
+        self._resumed.set() # The first sample then catches the caller in the profiled code
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        sys.setswitchinterval(self._switch_interval)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        self._resumed.wait()
+        self._sample(own_id)
+        while not self._stop.wait(self.interval_seconds):
+            self._sample(own_id)
+        self._sample(own_id)
+
+    def _sample(self, own_id):
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_name, code.co_firstlineno))
+                frame = frame.f_back
+            if not stack:
+                continue
+            if thread_id == self._profiled_thread_id:
+                if any(filename == __file__ and function_name in ('start', 'stop') for filename, function_name, _ in stack):
+                    continue # The profiler's own bookkeeping
+            elif (os.path.basename(stack[0][0]), stack[0][1]) in IDLE_LEAF_FRAMES:
+                continue
+            stack.append(('<thread>', thread_names.get(thread_id, str(thread_id)), 0))
+            self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def write_collapsed(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                frames = [f"thread {stack[0][1]}"] + [format_frame(*frame) for frame in stack[1:]]
+                f.write(';'.join(frame.replace(';', ':') for frame in frames) + f" {count}\n")
+
+    def hotspots(self, top_n):
+        self_counts = Counter()
+        total_counts = Counter()
+        category_counts = Counter()
+        for stack, count in self.stacks.items():
+            leaf = stack[-1]
+            self_counts[leaf] += count
+            category_counts[categorize(leaf[0])] += count
+            for frame in set(stack[1:]):
+                total_counts[frame] += count
+        samples = self.samples or 1
+        return (
+            [
+                {
+                    'function': format_frame(*frame),
+                    'self_percentage': round(count / samples * 100.0, 2),
+                    'total_percentage': round(total_counts[frame] / samples * 100.0, 2)
+                }
+                for frame, count in self_counts.most_common(top_n)
+            ],
+            {category: round(count / samples * 100.0, 2) for category, count in category_counts.most_common()}
+        )
+
+def cprofile_hotspots(profile, top_n):
+    stats = pstats.Stats(profile).stats # (file, line, function) -> (primitive calls, calls, self s, cumulative s, callers)
+    total_self_seconds = sum(entry[2] for entry in stats.values()) or 1.0
+    category_seconds = Counter()
+    for (filename, _, _), entry in stats.items():
+        category_seconds[categorize(filename)] += entry[2]
+    top = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:top_n]
+    return (
+        [
+            {
+                'function': format_frame(filename, function_name, line_number),
+                'calls': entry[1],
+                'self_ms': round(entry[2] * 1000.0, 3),
+                'cumulative_ms': round(entry[3] * 1000.0, 3)
+            }
+            for (filename, line_number, function_name), entry in top
+        ],
+        {category: round(seconds / total_self_seconds * 100.0, 2) for category, seconds in category_seconds.most_common()}
+    )
+
+def cprofile_collapsed_stacks(profile):
+    """
+    Rebuilds collapsed stacks from a cProfile call graph as {stack: self microseconds}.
+    cProfile keeps caller -> callee edges rather than whole stacks, so a function's
+    edge times are split across the stacks that reach it in proportion to the
+    cumulative time it spent on each; recursive calls are folded into their first
+    appearance on the stack.
+    """
+    stats = pstats.Stats(profile).stats
+    callees = defaultdict(dict) # caller -> {callee: (self s, cumulative s) on that edge}
+    for function, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees[caller][function] = (edge[2], edge[3])
+
+    stacks = Counter()
+    def walk(function, path, self_seconds, cumulative_seconds):
+        path = path + (function,)
+        if self_seconds > 0:
+            stacks[path] += self_seconds * 1e6
+        function_cumulative = stats[function][3]
+        if not function_cumulative:
+            return
+        share = min(1.0, cumulative_seconds / function_cumulative)
+        for callee, (edge_self, edge_cumulative) in callees[function].items():
+            if callee not in path and edge_cumulative * share >= 1e-6: # Skip recursion and sub-microsecond branches
+                walk(callee, path, edge_self * share, edge_cumulative * share)
+
+    for function, (_, _, self_seconds, cumulative_seconds, callers) in stats.items():
+        if not callers:
+            walk(function, (), self_seconds, cumulative_seconds)
+    return {stack: int(round(microseconds)) for stack, microseconds in stacks.items() if round(microseconds) > 0}
+
+def write_cprofile_collapsed(profile, path):
+    with open(path, 'w') as f:
+        for stack, microseconds in sorted(cprofile_collapsed_stacks(profile).items(), key=lambda item: -item[1]):
+            frames = [format_frame(filename, function_name, line_number) for filename, line_number, function_name in stack]
+            f.write(';'.join(frame.replace(';', ':') for frame in frames) + f" {microseconds}\n")
+
+@contextmanager
+def profile_phase(phase, label, mode=None):
+    """
+    Profiles the enclosed block as `phase` ('init' or 'invoke') of `label`, writes
+    the profile under HANDLER_PROFILE_DIR and logs the hotspot summary.
+    """
+    mode = (mode or HANDLER_PROFILING).lower()
+    if mode not in PROFILING_MODES:
+        logger.error(f"Invalid HANDLER_PROFILING '{mode}'. Expected one of {PROFILING_MODES}. Profiling disabled.")
+        mode = 'off'
+    if mode == 'off':
+        yield
+        return
+
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+    else:
+        profiler = SamplingProfiler(HANDLER_PROFILE_SAMPLE_INTERVAL_MS / 1000.0)
+        profiler.start()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration_ms = (time.perf_counter() - started) * 1000.0
+        if mode == 'cprofile':
+            profiler.disable()
+        else:
+            profiler.stop()
+        try:
+            _write_profile(profiler, mode, phase, label, duration_ms)
+        except Exception as e:
+            logger.warning(f"Could not write the {phase} profile for '{label}': {e}")
+
+def _write_profile(profiler, mode, phase, label, duration_ms):
+    os.makedirs(HANDLER_PROFILE_DIR, exist_ok=True)
+    _profile_sequence[(label, phase)] += 1
+    base_path = os.path.join(HANDLER_PROFILE_DIR, f"{label}.{phase}.{os.getpid()}.{_profile_sequence[(label, phase)]}")
+
+    record = {'profile': label, 'phase': phase, 'mode': mode, 'duration_ms': round(duration_ms, 2)}
+    if mode == 'cprofile':
+        record['path'] = base_path + '.prof'
+        profiler.dump_stats(record['path'])
+        record['collapsed_path'] = base_path + '.collapsed'
+        write_cprofile_collapsed(profiler, record['collapsed_path'])
+        record['hotspots'], record['self_time_percentage_by_category'] = cprofile_hotspots(profiler, HANDLER_PROFILE_TOP_N)
+    else:
+        record['path'] = base_path + '.collapsed'
+        profiler.write_collapsed(record['path'])
+        record['samples'] = profiler.samples
+        record['hotspots'], record['self_time_percentage_by_category'] = profiler.hotspots(HANDLER_PROFILE_TOP_N)
+    profile_logger.info("%s", LazyJson(record))
+
+def profiled(handler_function, label=None):
+    """
+    Wraps a handler so every invocation is profiled as the 'invoke' phase.
+    Coroutine handlers (code.handler) are run with asyncio.run.
+    """
+    label = label or f"{handler_function.__module__}.{handler_function.__name__}"
+    is_coroutine = inspect.iscoroutinefunction(handler_function)
+
+    @functools.wraps(handler_function)
+    def wrapper(event, context):
+        with profile_phase('invoke', label):
+            if is_coroutine:
+                return asyncio.run(handler_function(event, context))
+            return handler_function(event, context)
+    return wrapper
+
+def load_profiled_handler(handler_path):
+    """
+    Imports 'module.function' under the init profile and returns it wrapped for
+    invoke profiling (or unwrapped when profiling is off).
+    """
+    module_name, _, function_name = handler_path.rpartition('.')
+    if not module_name:
+        raise ValueError(f"PROFILED_HANDLER '{handler_path}' must be 'module.function'.")
+    with profile_phase('init', handler_path):
+        handler_function = getattr(importlib.import_module(module_name), function_name)
+    if HANDLER_PROFILING == 'off':
+        return handler_function
+    return profiled(handler_function, handler_path)
+
+# Imported during the Lambda init phase, so the real handler's import is profiled as init
+_profiled_handler = load_profiled_handler(PROFILED_HANDLER) if PROFILED_HANDLER else None
+
+def handler(event, context):
+    """
+    Lambda entry point that runs PROFILED_HANDLER under the configured profiler.
+    """
+    if _profiled_handler is None:
+        raise RuntimeError("Set PROFILED_HANDLER to the handler to profile, e.g. 'step5.handler'.")
+    return _profiled_handler(event, context)
+
+# --- Local profiling against the simulated backend ---
+
+def main():
+    import load_test # Local tooling only; not needed in Lambda
+
+    parser = argparse.ArgumentParser(description="Profile a handler's init and invoke phases against the simulated backend.")
+    parser.add_argument('handler', choices=load_test.HANDLERS)
+    parser.add_argument('--mode', choices=PROFILING_MODES[1:], default='sampling')
+    parser.add_argument('--fleet-size', type=int, default=50)
+    parser.add_argument('--targets-per-group', type=int, default=20)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Injected per-call AWS API latency.")
+    parser.add_argument('--probe-latency-ms', type=float, default=20.0)
+    parser.add_argument('--invocations', type=int, default=3)
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(message)s')
+    server, base_url = load_test.start_http_fleet(args.probe_latency_ms / 1000.0)
+    options = {
+        'targets_per_group': args.targets_per_group,
+        'unhealthy_fraction': 0.05,
+        'probe_base_url': base_url,
+        'switchover_flag': 'auto'
+    }
+    try:
+        with profile_phase('init', args.handler, args.mode):
+            invoke, _ = load_test.install_handler(args.handler, args.fleet_size, args.latency_ms / 1000.0, options)
+        for _ in range(args.invocations):
+            with profile_phase('invoke', args.handler, args.mode):
+                invoke()
+    finally:
+        server.shutdown()
+    print(f"Profiles written to {HANDLER_PROFILE_DIR}")
+
+if __name__ == '__main__':
+    main()
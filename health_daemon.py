@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import argparse
+import importlib
+from datetime import datetime, timezone
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+
+# --- Health Daemon ---
+# Long-running alternative to the scheduled Lambdas: evaluates on a background
+# schedule with the existing handlers and serves the latest result from memory,
+# so Route 53 HTTP health checks and dashboards share one evaluation.
+#
+#   GET /health         200 HEALTHY / 503 UNHEALTHY or PENDING, small JSON body
+#   GET /health/detail  full result of the latest evaluation
+#
+# Both endpoints send an ETag and answer a matching If-None-Match with 304 Not
+# Modified, but only while the cached verdict is 200.
+
+# Evaluator aliases; any 'module:function' with the Lambda handler signature also works
+EVALUATORS = {
+    'step5': 'step5:handler',
+    'healthcheck': 'healthcheck:lambda_handler',
+}
+
+HEALTH_DAEMON_HOST = os.environ.get('HEALTH_DAEMON_HOST', '127.0.0.1')
+HEALTH_DAEMON_PORT = int(os.environ.get('HEALTH_DAEMON_PORT', '8080'))
+HEALTH_DAEMON_INTERVAL_SECONDS = float(os.environ.get('HEALTH_DAEMON_INTERVAL_SECONDS', '60'))
+
+MAX_REQUEST_HEAD_BYTES = 8192
+CLIENT_IDLE_TIMEOUT_SECONDS = 30
+
+REASON_PHRASES = {200: 'OK', 304: 'Not Modified', 404: 'Not Found', 405: 'Method Not Allowed', 503: 'Service Unavailable'}
+
+def resolve_evaluator(evaluator):
+    """
+    Returns the handler for an evaluator alias or 'module:function' string.
+    """
+    if callable(evaluator):
+        return evaluator
+    module_name, _, function_name = EVALUATORS.get(evaluator, evaluator).partition(':')
+    if not function_name:
+        raise ValueError(f"Evaluator '{evaluator}' must be one of {sorted(EVALUATORS)} or 'module:function'.")
+    return getattr(importlib.import_module(module_name), function_name)
+
+class CachedResponse:
+    """
+    A pre-serialized response body with its ETag, rebuilt only when a new
+    evaluation result arrives.
+    """
+
+    __slots__ = ('status_code', 'body', 'etag')
+
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self.body = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest() + '"'
+
+class HealthDaemon:
+    """
+    Runs an evaluator on a fixed interval and serves its latest result over HTTP.
+    """
+
+    def __init__(self, evaluator, interval_seconds=HEALTH_DAEMON_INTERVAL_SECONDS):
+        self.evaluator_name = evaluator if isinstance(evaluator, str) else getattr(evaluator, '__name__', 'custom')
+        self.evaluate = resolve_evaluator(evaluator)
+        self.interval_seconds = interval_seconds
+        self.evaluations = 0
+        pending = {'status': 'PENDING', 'evaluator': self.evaluator_name}
+        self.responses = {'/health': CachedResponse(503, pending), '/health/detail': CachedResponse(503, pending)}
+
+    async def evaluate_once(self):
+        """
+        Runs one evaluation in a worker thread (the handlers are blocking) and
+        swaps in the new cached responses.
+        """
+        started = time.perf_counter()
+        try:
+            result = await asyncio.to_thread(self.evaluate, {'source': 'health-daemon'}, None)
+            status_code = result.get('statusCode', 500)
+            try:
+                body = json.loads(result.get('body', 'null'))
+            except (TypeError, ValueError):
+                body = result.get('body')
+        except Exception as e:
+            logger.error("Health evaluation with '%s' failed: %s", self.evaluator_name, e, exc_info=True)
+            status_code, body = 500, f'Evaluation failed: {e}'
+
+        self.evaluations += 1
+        healthy = status_code == 200
+        status = 'HEALTHY' if healthy else 'UNHEALTHY'
+        evaluated_at = datetime.now(timezone.utc).isoformat()
+        http_status = 200 if healthy else 503
+
+        self.responses = {
+            # Status only, so the ETag stays stable for as long as the verdict does
+            '/health': CachedResponse(http_status, {'status': status}),
+            '/health/detail': CachedResponse(http_status, {
+                'status': status,
+                'evaluator': self.evaluator_name,
+                'evaluated_at': evaluated_at,
+                'evaluation_ms': round((time.perf_counter() - started) * 1000.0, 2),
+                'evaluations': self.evaluations,
+                'handler_status_code': status_code,
+                'result': body
+            })
+        }
+        logger.info("Health evaluation %d with '%s': %s", self.evaluations, self.evaluator_name, status)
+
+    async def run_schedule(self):
+        """
+        Evaluates immediately, then every interval_seconds measured start to start.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await self.evaluate_once()
+            await asyncio.sleep(max(0.0, self.interval_seconds - (loop.time() - started)))
+
+    def build_response(self, method, path, headers):
+        if method not in ('GET', 'HEAD'):
+            return 405, b'', None
+        cached = self.responses.get(path.split('?', 1)[0])
+        if cached is None:
+            return 404, b'{"error": "not found"}', None
+        # 304 means "would have been 200": pollers treat any 3xx as healthy, so a
+        # cached 503 is always sent in full
+        if cached.status_code == 200 and headers.get('if-none-match') == cached.etag:
+            return 304, b'', cached.etag
+        return cached.status_code, cached.body, cached.etag
+
+    async def handle_connection(self, reader, writer):
+        """
+        Minimal HTTP/1.1 server loop with keep-alive; requests have no body.
+        """
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), CLIENT_IDLE_TIMEOUT_SECONDS)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+                    return
+                if len(head) > MAX_REQUEST_HEAD_BYTES:
+                    return
+
+                request_line, *header_lines = head.decode('latin-1').split('\r\n')
+                parts = request_line.split(' ')
+                if len(parts) != 3:
+                    return
+                method, path, version = parts
+                headers = {}
+                for line in header_lines:
+                    name, sep, value = line.partition(':')
+                    if sep:
+                        headers[name.strip().lower()] = value.strip()
+
+                status_code, body, etag = self.build_response(method, path, headers)
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                response_headers = [
+                    f"HTTP/1.1 {status_code} {REASON_PHRASES.get(status_code, '')}",
+                    "Content-Type: application/json",
+                    "Cache-Control: no-cache",
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}",
+                ]
+                if status_code != 304:
+                    # HEAD advertises the length of the GET body without sending it
+                    response_headers.append(f"Content-Length: {len(body)}")
+                if etag:
+                    response_headers.append(f"ETag: {etag}")
+                try:
+                    writer.write(('\r\n'.join(response_headers) + '\r\n\r\n').encode('latin-1') + (b'' if method == 'HEAD' else body))
+                    await writer.drain()
+                except ConnectionError:
+                    return # Client went away (reset or broken pipe) before the response was sent
+                if not keep_alive:
+                    return
+        finally:
+            writer.close()
+
+    async def serve(self, host=HEALTH_DAEMON_HOST, port=HEALTH_DAEMON_PORT):
+        """
+        Starts the HTTP endpoint and the evaluation schedule and runs until cancelled.
+        """
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        logger.info("Health daemon serving '%s' results on http://%s:%d/health", self.evaluator_name, host, port)
+        async with server:
+            await asyncio.gather(server.serve_forever(), self.run_schedule())
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve cached health results over HTTP.")
+    parser.add_argument('--evaluator', default='step5', help=f"One of {sorted(EVALUATORS)} or 'module:function'.")
+    parser.add_argument('--host', default=HEALTH_DAEMON_HOST)
+    parser.add_argument('--port', type=int, default=HEALTH_DAEMON_PORT)
+    parser.add_argument('--interval', type=float, default=HEALTH_DAEMON_INTERVAL_SECONDS, help="Seconds between evaluations.")
+    args = parser.parse_args()
+
+    logging.basicConfig()
+    daemon = HealthDaemon(args.evaluator, args.interval)
+    try:
+        asyncio.run(daemon.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,361 @@
+import os
+import json
+import mmap
+import time
+import fcntl
+import hashlib
+import logging
+import argparse
+from datetime import datetime, timezone
+from contextlib import ExitStack
+
+np = None # numpy, imported by HealthTimeSeriesStore; make sure it is bundled or provided through a Lambda layer
+
+# Configure logging
+logger = logging.getLogger()
+
+# --- Health Time-Series Store ---
+# Local history of health results for failover audits, without querying CloudWatch.
+# Every series (an ALB, target group, probed endpoint or ECS service) is a directory
+# of append-only column files: raw samples plus 1-minute, 1-hour and 1-day rollups.
+# Rollup rows are appended once their bucket closes (when a later sample arrives);
+# queries combine the coarsest closed buckets with finer levels at the edges, and
+# read every column through mmap, so they take milliseconds over months of data.
+#
+# Set HEALTH_TIMESERIES_DIR to enable recording from the handlers. In Lambda it must
+# point at persistent storage (e.g. an EFS mount); /tmp does not survive recycling.
+
+HEALTH_TIMESERIES_DIR = os.environ.get('HEALTH_TIMESERIES_DIR', '')
+
+SERIES_KINDS = ('alb', 'target_group', 'endpoint', 'service', 'healthcheck')
+
+# Column dtypes are NumPy type names so importing this module does not load NumPy
+RAW_COLUMNS = (('ts', 'int64'), ('healthy', 'uint8'), ('value', 'float32'))
+ROLLUP_COLUMNS = (
+    ('start', 'int64'),
+    ('samples', 'uint32'),
+    ('healthy', 'uint32'),
+    ('value_sum', 'float64'),
+    ('value_min', 'float32'),
+    ('value_max', 'float32')
+)
+ROLLUP_LEVELS = (('1m', 60), ('1h', 3600), ('1d', 86400))
+
+EMPTY_AGGREGATE = (0, 0, 0.0, float('inf'), float('-inf')) # samples, healthy, value_sum, value_min, value_max
+
+def _combine(a, b):
+    return (a[0] + b[0], a[1] + b[1], a[2] + b[2], min(a[3], b[3]), max(a[4], b[4]))
+
+def _map_column(path, dtype):
+    """
+    Returns the column file as a read-only array backed by mmap (empty if missing).
+    """
+    try:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return np.empty(0, dtype=dtype)
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return np.empty(0, dtype=dtype)
+    itemsize = np.dtype(dtype).itemsize
+    return np.frombuffer(buffer, dtype=dtype, count=len(buffer) // itemsize)
+
+class HealthTimeSeriesStore:
+    """
+    Append-only columnar health history under a root directory.
+    """
+
+    def __init__(self, root):
+        global np
+        if np is None:
+            # Deferred so handlers with recording disabled never load NumPy on their cold path
+            import numpy
+            np = numpy
+        self.root = root
+
+    # --- Layout ---
+
+    def _series_dir(self, kind, name):
+        if kind not in SERIES_KINDS:
+            raise ValueError(f"Unknown series kind '{kind}'. Expected one of {SERIES_KINDS}.")
+        return os.path.join(self.root, kind, hashlib.sha1(name.encode('utf-8')).hexdigest()[:20])
+
+    def _read_columns(self, directory, prefix, columns):
+        """
+        Maps every column of a table. Readers do not take the lock, so a torn append
+        (a row in some columns only) is hidden by truncating all columns to the
+        shortest one; the next writer removes it from the files (see _open_table).
+        """
+        arrays = {name: _map_column(os.path.join(directory, f"{prefix}.{name}"), dtype) for name, dtype in columns}
+        length = min(len(array) for array in arrays.values())
+        return {name: array[:length] for name, array in arrays.items()}
+
+    def _open_table(self, directory, prefix, columns, stack):
+        """
+        Opens every column of a table for appending (with the series lock held) and
+        maps its rows. Columns longer than the shortest one, or ending in a partial
+        row, are truncated first so a torn append cannot misalign later rows.
+        Returns ({column: file}, {column: array}); the files are closed by `stack`.
+        """
+        files = {name: stack.enter_context(open(os.path.join(directory, f"{prefix}.{name}"), 'a+b')) for name, _ in columns}
+        sizes = {name: os.fstat(files[name].fileno()).st_size for name, _ in columns}
+        length = min(sizes[name] // np.dtype(dtype).itemsize for name, dtype in columns)
+        arrays = {}
+        for name, dtype in columns:
+            size = length * np.dtype(dtype).itemsize
+            if sizes[name] != size:
+                logger.warning(f"Truncating torn column '{prefix}.{name}' in '{directory}' from {sizes[name]} to {size} bytes.")
+                os.ftruncate(files[name].fileno(), size)
+            if size == 0:
+                arrays[name] = np.empty(0, dtype=dtype)
+            else:
+                arrays[name] = np.frombuffer(mmap.mmap(files[name].fileno(), size, access=mmap.ACCESS_READ), dtype=dtype)
+        return files, arrays
+
+    def _append_columns(self, files, columns, rows):
+        for name, dtype in columns:
+            files[name].write(np.asarray(rows[name], dtype=dtype).tobytes())
+
+    # --- Writes ---
+
+    def append(self, kind, name, healthy, value, timestamp=None):
+        """
+        Appends one sample; see append_rows.
+        """
+        self.append_rows(kind, name, [(time.time() if timestamp is None else timestamp, healthy, value)])
+
+    def append_rows(self, kind, name, rows):
+        """
+        Appends [(timestamp, healthy, value)] to one series under a single lock.
+        Timestamps are epoch seconds and never go backwards within a series; an
+        earlier timestamp is recorded as the latest one.
+        """
+        if not rows:
+            return
+        directory = self._series_dir(kind, name)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, 'lock'), 'a') as lock, ExitStack() as stack:
+            fcntl.flock(lock, fcntl.LOCK_EX) # Writers on shared storage (EFS) append one at a time
+            meta_path = os.path.join(directory, 'meta.json')
+            if not os.path.exists(meta_path):
+                with open(meta_path, 'w') as f:
+                    json.dump({'kind': kind, 'name': name}, f)
+
+            raw_files, raw = self._open_table(directory, 'raw', RAW_COLUMNS, stack)
+            previous_ts = int(raw['ts'][-1]) if len(raw['ts']) else None
+            ts = np.array([int(row[0]) for row in rows], dtype=np.int64)
+            if previous_ts is not None:
+                ts[0] = max(ts[0], previous_ts)
+            ts = np.maximum.accumulate(ts)
+            new_raw = {
+                'ts': ts,
+                'healthy': np.array([1 if row[1] else 0 for row in rows], dtype=np.uint8),
+                'value': np.array([row[2] for row in rows], dtype=np.float32)
+            }
+            self._roll_up(directory, raw, new_raw, previous_ts, stack)
+            self._append_columns(raw_files, RAW_COLUMNS, new_raw)
+
+    def _roll_up(self, directory, raw, new_raw, previous_ts, stack):
+        """
+        Appends rollup rows for every bucket that closed before the last new raw
+        sample, level by level: raw -> 1m -> 1h -> 1d. Each level reads only its
+        source rows after its own last bucket, from the mapped tail plus the rows
+        appended in this call; levels whose current bucket is still open are not
+        opened at all.
+        """
+        def raw_source(arrays):
+            return {
+                'start': arrays['ts'],
+                'samples': np.broadcast_to(np.uint32(1), arrays['ts'].shape), # One per raw sample
+                'healthy': arrays['healthy'],
+                'value_sum': arrays['value'],
+                'value_min': arrays['value'],
+                'value_max': arrays['value']
+            }
+
+        now = int(new_raw['ts'][-1])
+        mapped, appended = raw_source(raw), raw_source(new_raw)
+        for prefix, width in ROLLUP_LEVELS:
+            if previous_ts is not None and previous_ts // width == now // width:
+                return # No bucket of this level (or any coarser one) closed since the last append
+            files, existing = self._open_table(directory, prefix, ROLLUP_COLUMNS, stack)
+            rolled_end = int(existing['start'][-1]) + width if len(existing['start']) else np.iinfo(np.int64).min
+            closed_end = now // width * width
+
+            first = np.searchsorted(mapped['start'], rolled_end)
+            source = {column: np.concatenate((mapped[column][first:], appended[column])) for column, _ in ROLLUP_COLUMNS}
+            lo, hi = np.searchsorted(source['start'], [rolled_end, closed_end])
+            rows = {column: np.empty(0, dtype=dtype) for column, dtype in ROLLUP_COLUMNS}
+            if hi > lo:
+                keys = source['start'][lo:hi] // width * width
+                bucket_starts, offsets = np.unique(keys, return_index=True)
+                rows = {
+                    'start': bucket_starts,
+                    'samples': np.add.reduceat(source['samples'][lo:hi], offsets),
+                    'healthy': np.add.reduceat(source['healthy'][lo:hi].astype(np.uint32), offsets),
+                    'value_sum': np.add.reduceat(source['value_sum'][lo:hi].astype(np.float64), offsets),
+                    'value_min': np.minimum.reduceat(source['value_min'][lo:hi], offsets),
+                    'value_max': np.maximum.reduceat(source['value_max'][lo:hi], offsets)
+                }
+                self._append_columns(files, ROLLUP_COLUMNS, rows)
+            mapped, appended = existing, rows
+
+    # --- Queries ---
+
+    def _aggregate(self, directory, start, end, level_index):
+        """
+        Aggregates [start, end) using whole closed buckets of ROLLUP_LEVELS[level_index]
+        and finer levels (down to raw, level_index -1) for the remainder.
+        """
+        if start >= end:
+            return EMPTY_AGGREGATE
+        if level_index < 0:
+            raw = self._read_columns(directory, 'raw', RAW_COLUMNS)
+            lo, hi = np.searchsorted(raw['ts'], [start, end])
+            if hi <= lo:
+                return EMPTY_AGGREGATE
+            values = raw['value'][lo:hi]
+            return (int(hi - lo), int(raw['healthy'][lo:hi].sum()), float(values.sum(dtype=np.float64)), float(values.min()), float(values.max()))
+
+        prefix, width = ROLLUP_LEVELS[level_index]
+        rollup = self._read_columns(directory, prefix, ROLLUP_COLUMNS)
+        rolled_end = int(rollup['start'][-1]) + width if len(rollup['start']) else start
+        inner_start = -(-start // width) * width
+        inner_end = min(end // width * width, rolled_end)
+        if inner_start >= inner_end:
+            return self._aggregate(directory, start, end, level_index - 1)
+
+        lo, hi = np.searchsorted(rollup['start'], [inner_start, inner_end])
+        inner = EMPTY_AGGREGATE
+        if hi > lo:
+            inner = (
+                int(rollup['samples'][lo:hi].sum()),
+                int(rollup['healthy'][lo:hi].sum()),
+                float(rollup['value_sum'][lo:hi].sum()),
+                float(rollup['value_min'][lo:hi].min()),
+                float(rollup['value_max'][lo:hi].max())
+            )
+        left = self._aggregate(directory, start, inner_start, level_index - 1)
+        right = self._aggregate(directory, inner_end, end, level_index - 1)
+        return _combine(_combine(left, inner), right)
+
+    def availability(self, kind, name, start, end):
+        """
+        Returns the share of healthy samples in [start, end) with value statistics,
+        or None when the series has no samples in the range.
+        """
+        directory = self._series_dir(kind, name)
+        samples, healthy, value_sum, value_min, value_max = self._aggregate(directory, int(start), int(end), len(ROLLUP_LEVELS) - 1)
+        if not samples:
+            return None
+        return {
+            'kind': kind,
+            'name': name,
+            'samples': samples,
+            'healthy_samples': healthy,
+            'availability_percentage': healthy / samples * 100.0,
+            'mean_value': value_sum / samples,
+            'min_value': value_min,
+            'max_value': value_max
+        }
+
+    def state_changes(self, kind, name, start, end):
+        """
+        Returns the state at the first sample in [start, end) followed by every
+        healthy <-> unhealthy transition, as [{'timestamp', 'healthy', 'value'}].
+        """
+        raw = self._read_columns(self._series_dir(kind, name), 'raw', RAW_COLUMNS)
+        lo, hi = np.searchsorted(raw['ts'], [int(start), int(end)])
+        if hi <= lo:
+            return []
+        healthy = raw['healthy'][lo:hi]
+        indexes = np.concatenate(([0], np.flatnonzero(np.diff(healthy.astype(np.int8))) + 1)) + lo
+        return [
+            {'timestamp': int(raw['ts'][i]), 'healthy': bool(raw['healthy'][i]), 'value': float(raw['value'][i])}
+            for i in indexes
+        ]
+
+    def list_series(self, kind=None):
+        """
+        Returns [(kind, name)] for every recorded series, optionally of one kind.
+        """
+        series = []
+        for series_kind in ([kind] if kind else SERIES_KINDS):
+            kind_dir = os.path.join(self.root, series_kind)
+            if not os.path.isdir(kind_dir):
+                continue
+            for entry in sorted(os.listdir(kind_dir)):
+                try:
+                    with open(os.path.join(kind_dir, entry, 'meta.json')) as f:
+                        series.append((series_kind, json.load(f)['name']))
+                except (OSError, ValueError, KeyError):
+                    continue
+        return series
+
+_store = None
+
+def get_store():
+    """
+    Returns the store under HEALTH_TIMESERIES_DIR, or None when recording is disabled.
+    """
+    global _store
+    if not HEALTH_TIMESERIES_DIR:
+        return None
+    if _store is None:
+        _store = HealthTimeSeriesStore(HEALTH_TIMESERIES_DIR)
+    return _store
+
+def record_health_samples(samples, timestamp=None):
+    """
+    Records [(kind, name, healthy, value)] with one shared timestamp, taking each
+    series' lock once. A no-op when HEALTH_TIMESERIES_DIR is unset; failures are
+    logged and never fail the caller.
+    """
+    store = get_store()
+    if store is None or not samples:
+        return
+    timestamp = time.time() if timestamp is None else timestamp
+    rows_by_series = {} # (kind, name) -> rows, in first-seen order
+    for kind, name, healthy, value in samples:
+        rows_by_series.setdefault((kind, name), []).append((timestamp, healthy, value))
+    try:
+        for (kind, name), rows in rows_by_series.items():
+            store.append_rows(kind, name, rows)
+    except Exception as e:
+        logger.warning(f"Could not record health history in '{HEALTH_TIMESERIES_DIR}': {e}")
+
+# --- Command line queries ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the local health history.")
+    parser.add_argument('--dir', default=HEALTH_TIMESERIES_DIR or None, required=not HEALTH_TIMESERIES_DIR, help="Store directory (defaults to HEALTH_TIMESERIES_DIR).")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help="List recorded series.").add_argument('--kind', choices=SERIES_KINDS)
+    for command in ('availability', 'timeline'):
+        subparser = subparsers.add_parser(command)
+        subparser.add_argument('kind', choices=SERIES_KINDS)
+        subparser.add_argument('name')
+        subparser.add_argument('--hours', type=float, default=24.0, help="Look back this many hours from now.")
+    args = parser.parse_args()
+
+    store = HealthTimeSeriesStore(args.dir)
+    if args.command == 'list':
+        for kind, name in store.list_series(args.kind):
+            print(f"{kind}\t{name}")
+        return
+
+    end = int(time.time()) + 1
+    start = end - int(args.hours * 3600)
+    started = time.perf_counter()
+    if args.command == 'availability':
+        result = store.availability(args.kind, args.name, start, end)
+    else:
+        result = [
+            dict(change, at=datetime.fromtimestamp(change['timestamp'], timezone.utc).isoformat())
+            for change in store.state_changes(args.kind, args.name, start, end)
+        ]
+    print(json.dumps(result, indent=2))
+    print(f"Query took {(time.perf_counter() - started) * 1000.0:.2f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,23 @@
 import os
 import json
+import random
+import asyncio
 import logging
 import boto3
 import requests # Make sure 'requests' library is bundled or in a layer
 from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
+
+from request_coalescing import coalescing_client, reset_invocation_cache
+from structured_logging import RunSummary
+from config_snapshot import ConfigError, compile_dimensions, compile_service_endpoints
+from health_timeseries import record_health_samples
 
 # --- Global Configuration and Clients ---
 logger = logging.getLogger()
 logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
 
-ssm_client = boto3.client('ssm')
+ssm_client = coalescing_client(boto3.client('ssm')) # Identical SSM reads are shared per invocation
 cloudwatch_client = boto3.client('cloudwatch')
 sns_client = boto3.client('sns') # Initialize SNS client
 
@@ -22,6 +30,21 @@ CLOUDWATCH_NAMESPACE = os.environ.get('CLOUDWATCH_NAMESPACE', 'CTSI/HealthChecks
 CLOUDWATCH_METRIC_NAME = os.environ.get('CLOUDWATCH_METRIC_NAME', 'BinaryHealthCheck')
 CLOUDWATCH_METRIC_UNIT = os.environ.get('CLOUDWATCH_METRIC_UNIT', 'Count')
 CLOUDWATCH_DIMENSIONS = os.environ.get('CLOUDWATCH_DIMENSIONS', '') # Expects JSON string ""
+PROBE_CONCURRENCY = int(os.environ.get('PROBE_CONCURRENCY', '32')) # Parallel HTTP probes
+
+# What to do with the probes when force_healthy / force_unhealthy (or an invalid flag) decides the metric:
+#   background - publish immediately, run every probe afterwards for visibility (default)
+#   skip       - publish immediately, run no probes
+#   sampled    - publish immediately, probe only FORCED_FLAG_PROBE_SAMPLE_SIZE random services
+FORCED_FLAG_PROBE_POLICIES = ('background', 'skip', 'sampled')
+FORCED_FLAG_PROBE_POLICY = os.environ.get('FORCED_FLAG_PROBE_POLICY', 'background').lower()
+FORCED_FLAG_PROBE_SAMPLE_SIZE = int(os.environ.get('FORCED_FLAG_PROBE_SAMPLE_SIZE', '3'))
+if FORCED_FLAG_PROBE_POLICY not in FORCED_FLAG_PROBE_POLICIES:
+    logger.error(f"Invalid FORCED_FLAG_PROBE_POLICY '{FORCED_FLAG_PROBE_POLICY}'. Expected one of {FORCED_FLAG_PROBE_POLICIES}. Using 'background'.")
+    FORCED_FLAG_PROBE_POLICY = 'background'
+
+# Dedicated pool so probes are not capped by the (vCPU-sized) default executor
+probe_executor = ThreadPoolExecutor(max_workers=PROBE_CONCURRENCY, thread_name_prefix='probe')
 
 # --- Helper Functions (Modular Format) ---
 
@@ -42,7 +65,14 @@ def publish_cloudwatch_metric(namespace, metric_name, value, unit, dimensions):
     try:
         cloudwatch_client.put_metric_data(
             Namespace=namespace,
-            MetricData=
+            MetricData=[
+                {
+                    'MetricName': metric_name,
+                    'Dimensions': dimensions,
+                    'Value': float(value),
+                    'Unit': unit
+                },
+            ]
         )
         logger.info(f"Published metric '{metric_name}' (Value: {value}, Unit: {unit}) to namespace '{namespace}' with dimensions {dimensions}")
     except ClientError as e:
@@ -50,18 +80,18 @@ def publish_cloudwatch_metric(namespace, metric_name, value, unit, dimensions):
     except Exception as e:
         logger.error(f"An unexpected error occurred while publishing CloudWatch metric: {e}", exc_info=True)
 
-def check_service_health(service_name, url):
+def check_service_health(service_name, url, timeout=5):
     """Performs an HTTP GET request to a service health endpoint."""
     try:
-        response = requests.get(url, timeout=5) # 5-second timeout
+        response = requests.get(url, timeout=timeout) # 5-second timeout unless the endpoint sets its own
         if response.status_code == 200:
-            logger.info(f"Service '{service_name}' health check passed (200 OK) at {url}")
+            logger.debug("Service '%s' health check passed (200 OK) at %s", service_name, url)
             return True
         else:
             logger.warning(f"Service '{service_name}' health check failed: Status {response.status_code} at {url}")
             return False
     except requests.exceptions.Timeout:
-        logger.error(f"Service '{service_name}' health check timed out after 5s at {url}")
+        logger.error(f"Service '{service_name}' health check timed out after {timeout}s at {url}")
         return False
     except requests.exceptions.ConnectionError as e:
         logger.error(f"Service '{service_name}' health check connection error at {url}: {e}")
@@ -92,106 +122,222 @@ def send_sns_notification(subject, message):
         logger.error(f"An unexpected error occurred while sending SNS notification: {e}", exc_info=True)
 
 def parse_dimensions(dim_str):
-    """Parses a JSON string of dimensions into a list of dictionaries."""
+    """Returns the compiled (cached, read-only) dimensions for a JSON string of dimensions."""
     try:
-        dims = json.loads(dim_str)
-        if not isinstance(dims, list):
-            raise ValueError("Dimensions must be a JSON array.")
-        for dim in dims:
-            if not all(k in dim for k in ['Name', 'Value']):
-                raise ValueError("Each dimension object must have 'Name' and 'Value'.")
-        return dims
-    except json.JSONDecodeError:
-        logger.error(f"Failed to decode CLOUDWATCH_DIMENSIONS: {dim_str}. Using empty dimensions.")
-        return
-    except ValueError as e:
-        logger.error(f"Invalid CLOUDWATCH_DIMENSIONS format: {e}. Using empty dimensions.")
-        return
+        return compile_dimensions(dim_str)
+    except ConfigError as e:
+        logger.error(f"Invalid CLOUDWATCH_DIMENSIONS: {e} Using empty dimensions.")
+        return ()
+
+def _retrieve_exception(task):
+    """Marks a background task's exception as retrieved when nobody ends up awaiting it."""
+    if not task.cancelled():
+        task.exception()
+
+async def probe_services(service_endpoints, results=None, on_failure=None):
+    """
+    Probes every endpoint concurrently and consumes results as they complete.
+    Returns the list of failed services in configuration order; when given,
+    results is filled with {service name: healthy} and on_failure(endpoint) is
+    called as soon as each failed probe completes.
+    """
+    loop = asyncio.get_running_loop()
+
+    async def probe(index, endpoint):
+        healthy = await loop.run_in_executor(probe_executor, check_service_health, endpoint.name, endpoint.url, endpoint.timeout_seconds)
+        return index, endpoint, healthy
+
+    failures = []
+    for completed in asyncio.as_completed([probe(index, endpoint) for index, endpoint in enumerate(service_endpoints)]):
+        index, endpoint, healthy = await completed
+        if results is not None:
+            results[endpoint.name] = healthy
+        if not healthy:
+            failures.append((index, f"Failed: {endpoint.name} at {endpoint.url}"))
+            if on_failure is not None:
+                on_failure(endpoint)
+    return [failure for _, failure in sorted(failures)]
+
+def select_endpoints_to_probe(switchover_flag, service_endpoints):
+    """
+    Applies FORCED_FLAG_PROBE_POLICY. 'auto' always probes every endpoint because
+    the published value depends on all of them.
+    """
+    if switchover_flag == 'auto' or FORCED_FLAG_PROBE_POLICY == 'background':
+        return service_endpoints
+    if FORCED_FLAG_PROBE_POLICY == 'sampled':
+        return random.sample(service_endpoints, min(FORCED_FLAG_PROBE_SAMPLE_SIZE, len(service_endpoints)))
+    return ()
+
+def determine_published_value(switchover_flag, actual_health_status):
+    """
+    Applies the switchover flag: returns (published_value, overall_status, status_code).
+    Only 'auto' depends on the probe results.
+    """
+    if switchover_flag == 'force_healthy':
+        return 1, "HEALTHY", 200
+    elif switchover_flag == 'force_unhealthy':
+        return 0, "UNHEALTHY", 500
+    elif switchover_flag == 'auto':
+        return actual_health_status, ("HEALTHY" if actual_health_status == 1 else "UNHEALTHY"), (200 if actual_health_status == 1 else 500)
+    else:
+        return 0, "UNHEALTHY", 500 # Invalid flag means unhealthy
+
+def build_notification(switchover_flag, actual_health_status, failed_services, not_evaluated_reason='probes skipped'):
+    """Returns the (subject, message) of the SNS notification for the outcome."""
+    if actual_health_status is None:
+        actual_status_text = f'NOT EVALUATED ({not_evaluated_reason})'
+    else:
+        actual_status_text = 'HEALTHY' if actual_health_status == 1 else 'UNHEALTHY'
+    if switchover_flag == 'force_healthy':
+        return ("Health Check Info: Status Forced Healthy",
+                f"Health check status is manually forced to HEALTHY via SSM flag '{switchover_flag}'. Actual health check result was {actual_status_text}. No failover will occur.")
+    elif switchover_flag == 'force_unhealthy':
+        return ("Health Check Alert: CRITICAL - Status Forced Unhealthy",
+                f"Health check status is manually forced to UNHEALTHY via SSM flag '{switchover_flag}'. Actual health check result was {actual_status_text}. Failover may be triggered.")
+    elif switchover_flag == 'auto':
+        if actual_health_status == 0:
+            return ("Health Check Alert: CRITICAL - Automated Health Check Failed",
+                    "Automated health check failed. Overall status: UNHEALTHY. Failover may be triggered.\n\nFailed Services:\n" + "\n".join(failed_services))
+        return ("Health Check Info: Automated Health Check Passed",
+                "Automated health check passed. Overall status: HEALTHY. No failover triggered.")
+    else:
+        return ("Health Check Alert: CRITICAL - Invalid Switchover Flag",
+                f"The SSM parameter '{SWITCHOVER_FLAG_SSM_PATH}' has an invalid value: '{switchover_flag}'. Expected 'auto', 'force_healthy', or 'force_unhealthy'. Health check defaulting to UNHEALTHY.")
 
 # --- Main Lambda Handler ---
 
 def lambda_handler(event, context):
+    """Synchronous Lambda entry point; runs the asyncio health check pipeline."""
+    return asyncio.run(lambda_handler_async(event, context))
+
+async def lambda_handler_async(event, context):
+    """
+    Health check pipeline. Independent steps overlap: both SSM reads run together,
+    probes start as soon as the endpoint list arrives, and the metric is published
+    as soon as its value is known: right after the flag for a flag that overrides
+    the probes, on the first failed probe in 'auto'. The remaining probes only
+    complete the notification. The SNS notification and any publish still
+    outstanding run concurrently at the end.
+    """
     logger.info("Starting custom service health check Lambda invocation.")
+    reset_invocation_cache() # Start every invocation with fresh SSM values
 
     # Initialize values for the final published metric and status
     final_published_metric_value = 0 # Default to unhealthy
     overall_status = "UNHEALTHY"
     status_code = 500
     actual_health_status = 0 # Initialize actual health status
-    
-    # Parse dimensions once
+    switchover_flag = None # Set once read from SSM
+    failed_services = []
+    early_publish_task = None # Set when the flag alone decides the published value
+    early_published_value = None
+    probed_services_count = 0
+    probe_results = {} # service name -> healthy, for the health history
+    actual_health_evaluated = False
+    not_evaluated_reason = None # Why actual health was not evaluated, when it was not
+    summary = RunSummary('healthcheck.lambda_handler') # Emitted once as a single JSON record
+
+    # Compiled once per execution environment; later invocations hit the snapshot cache
     dimensions = parse_dimensions(CLOUDWATCH_DIMENSIONS)
 
     notification_subject = "Health Check Alert: UNKNOWN STATUS"
     notification_message = "The health check Lambda encountered an unexpected error or configuration issue."
 
+    def publish_early(value):
+        """Starts publishing value before the pipeline finishes; only the first call publishes."""
+        nonlocal early_publish_task, early_published_value
+        if early_publish_task is None:
+            early_published_value = value
+            early_publish_task = asyncio.create_task(asyncio.to_thread(
+                publish_cloudwatch_metric, CLOUDWATCH_NAMESPACE, CLOUDWATCH_METRIC_NAME, value, CLOUDWATCH_METRIC_UNIT, dimensions
+            ))
+
+    def on_probe_failure(endpoint):
+        # In 'auto' the first failed probe already fixes the published value at 0
+        if switchover_flag == 'auto':
+            publish_early(0)
+
     try:
-        # 1. Fetch Control Parameters from SSM
-        switchover_flag = get_ssm_parameter(SWITCHOVER_FLAG_SSM_PATH).lower()
-        logger.info(f"Fetched switchover_flag: '{switchover_flag}' from SSM path: {SWITCHOVER_FLAG_SSM_PATH}")
-        
-        service_endpoints_str = get_ssm_parameter(SERVICE_HEALTH_ENDPOINTS_SSM_PATH)
-        service_endpoints = json.loads(service_endpoints_str) # Expects JSON array of objects
-        
-        if not isinstance(service_endpoints, list) or not service_endpoints:
-            logger.error("SERVICE_HEALTH_ENDPOINTS_SSM_PATH does not contain a valid non-empty JSON array of service endpoints. This will result in an unhealthy status.")
-            actual_health_status = 0 # Treat as unhealthy if config is bad
-            notification_subject = "Health Check Alert: CRITICAL - Invalid Service Endpoints Config"
-            notification_message = f"The SSM parameter '{SERVICE_HEALTH_ENDPOINTS_SSM_PATH}' is misconfigured or empty. Please check the JSON format. Health check cannot proceed."
-        else:
-            # 2. ALWAYS Perform Automated Health Checks (for internal visibility)
-            logger.info("Performing automated health checks for configured services.")
-            all_services_healthy = True
-            failed_services =
-            for service_config in service_endpoints:
-                service_name = service_config.get('name', 'unknown-service')
-                service_url = service_config.get('url')
-                
-                if not service_url:
-                    logger.error(f"Service '{service_name}' has no URL configured. Marking overall unhealthy for actual status.")
-                    all_services_healthy = False
-                    failed_services.append(f"Misconfigured: {service_name} (no URL)")
-                    # Continue to check other services if possible, but overall is already failed
-                elif not check_service_health(service_name, service_url):
-                    all_services_healthy = False
-                    failed_services.append(f"Failed: {service_name} at {service_url}")
-            
-            actual_health_status = 1 if all_services_healthy else 0
+        # 1. Fetch both control parameters from SSM concurrently
+        flag_task = asyncio.create_task(asyncio.to_thread(get_ssm_parameter, SWITCHOVER_FLAG_SSM_PATH))
+        endpoints_task = asyncio.create_task(asyncio.to_thread(get_ssm_parameter, SERVICE_HEALTH_ENDPOINTS_SSM_PATH))
+        flag_task.add_done_callback(_retrieve_exception)
+        endpoints_task.add_done_callback(_retrieve_exception)
+
+        # 2. Handle each read as it completes, the flag first when both are in. The flag never
+        # waits for the endpoints read: a forcing (or invalid) flag decides the published
+        # value on its own and publishes it straight away. In 'auto', a probe that already
+        # failed before the flag arrived does the same.
+        probes_task = None
+        service_endpoints = ()
+        endpoints_error = None
+        pending = {flag_task, endpoints_task}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+            if flag_task in done:
+                switchover_flag = flag_task.result().lower()
+                logger.info(f"Fetched switchover_flag: '{switchover_flag}' from SSM path: {SWITCHOVER_FLAG_SSM_PATH}")
+                if switchover_flag != 'auto':
+                    publish_early(determine_published_value(switchover_flag, actual_health_status)[0])
+                elif False in probe_results.values():
+                    publish_early(0)
+
+            if endpoints_task in done:
+                try:
+                    service_endpoints_str = endpoints_task.result()
+                except Exception as e:
+                    endpoints_error = e # Only fatal once the flag turns out to be 'auto'
+                    continue
+                try:
+                    # Validated and compiled once per distinct parameter value
+                    service_endpoints = compile_service_endpoints(service_endpoints_str) # Expects JSON array of objects
+                except ConfigError as e:
+                    logger.error(f"Invalid service endpoints configuration: {e} This will result in an unhealthy status.")
+                    failed_services.append(f"Misconfigured: SSM parameter '{SERVICE_HEALTH_ENDPOINTS_SSM_PATH}' ({e})")
+
+                # With the 'background' policy every probe runs whatever the flag says,
+                # so they can start before the flag arrives
+                if service_endpoints and FORCED_FLAG_PROBE_POLICY == 'background':
+                    probed_services_count = len(service_endpoints)
+                    probes_task = asyncio.create_task(probe_services(service_endpoints, probe_results, on_probe_failure))
+
+        if endpoints_error is not None:
+            if switchover_flag == 'auto':
+                raise endpoints_error # The probes decide the published value and cannot run
+            # The flag decides the published value; the failed read only costs visibility
+            logger.error(f"Could not read service endpoints from '{SERVICE_HEALTH_ENDPOINTS_SSM_PATH}': {endpoints_error}. Publishing the value set by switchover flag '{switchover_flag}'.")
+            failed_services.append(f"Unavailable: SSM parameter '{SERVICE_HEALTH_ENDPOINTS_SSM_PATH}' ({endpoints_error})")
+
+        if service_endpoints and probes_task is None:
+            endpoints_to_probe = select_endpoints_to_probe(switchover_flag, service_endpoints)
+            probed_services_count = len(endpoints_to_probe)
+            if endpoints_to_probe:
+                probes_task = asyncio.create_task(probe_services(endpoints_to_probe, probe_results, on_probe_failure))
+        if probed_services_count:
+            logger.info(f"Performing automated health checks for {probed_services_count}/{len(service_endpoints)} configured services.")
+
+        if probes_task is not None:
+            failed_services = await probes_task
+            actual_health_status = 0 if failed_services else 1
+        elif service_endpoints:
+            actual_health_status = None # Probes skipped by FORCED_FLAG_PROBE_POLICY
+            not_evaluated_reason = 'probes skipped'
+        elif endpoints_error is not None:
+            actual_health_status = None
+            not_evaluated_reason = 'service endpoints unavailable'
+        actual_health_evaluated = actual_health_status is not None
+        if actual_health_evaluated:
             logger.info(f"Actual health check result (irrespective of flag): {actual_health_status} ({'HEALTHY' if actual_health_status == 1 else 'UNHEALTHY'}).")
 
-        # 3. Apply Switchover Flag Logic to Determine Final Published Metric Value
-        if switchover_flag == 'force_healthy':
-            final_published_metric_value = 1
-            overall_status = "HEALTHY"
-            status_code = 200
-            logger.info(f"Health forced to HEALTHY by SSM flag '{switchover_flag}'. Actual health was {actual_health_status}.")
-            notification_subject = "Health Check Info: Status Forced Healthy"
-            notification_message = f"Health check status is manually forced to HEALTHY via SSM flag '{switchover_flag}'. Actual health check result was {'HEALTHY' if actual_health_status == 1 else 'UNHEALTHY'}. No failover will occur."
-        elif switchover_flag == 'force_unhealthy':
-            final_published_metric_value = 0
-            overall_status = "UNHEALTHY"
-            status_code = 500
-            logger.info(f"Health forced to UNHEALTHY by SSM flag '{switchover_flag}'. Actual health was {actual_health_status}.")
-            notification_subject = "Health Check Alert: CRITICAL - Status Forced Unhealthy"
-            notification_message = f"Health check status is manually forced to UNHEALTHY via SSM flag '{switchover_flag}'. Actual health check result was {'HEALTHY' if actual_health_status == 1 else 'UNHEALTHY'}. Failover may be triggered."
-        elif switchover_flag == 'auto':
-            final_published_metric_value = actual_health_status
-            overall_status = "HEALTHY" if actual_health_status == 1 else "UNHEALTHY"
-            status_code = 200 if actual_health_status == 1 else 500
-            logger.info(f"Health is in 'auto' mode. Publishing actual health: {final_published_metric_value}.")
-            if actual_health_status == 0:
-                notification_subject = "Health Check Alert: CRITICAL - Automated Health Check Failed"
-                notification_message = f"Automated health check failed. Overall status: UNHEALTHY. Failover may be triggered.\n\nFailed Services:\n" + "\n".join(failed_services)
-            else:
-                notification_subject = "Health Check Info: Automated Health Check Passed"
-                notification_message = "Automated health check passed. Overall status: HEALTHY. No failover triggered."
+        # 4. Apply Switchover Flag Logic to Determine Final Published Metric Value
+        final_published_metric_value, overall_status, status_code = determine_published_value(switchover_flag, actual_health_status)
+        notification_subject, notification_message = build_notification(switchover_flag, actual_health_status, failed_services, not_evaluated_reason)
+        if switchover_flag in ('auto', 'force_healthy', 'force_unhealthy'):
+            logger.info(f"Switchover flag '{switchover_flag}': publishing {final_published_metric_value}. Actual health was {actual_health_status}.")
         else:
             logger.error(f"Invalid switchover_flag value: '{switchover_flag}'. Expected 'auto', 'force_healthy', or 'force_unhealthy'. Defaulting to UNHEALTHY for published metric.")
-            final_published_metric_value = 0 # Invalid flag means unhealthy
-            overall_status = "UNHEALTHY"
-            status_code = 500
-            notification_subject = "Health Check Alert: CRITICAL - Invalid Switchover Flag"
-            notification_message = f"The SSM parameter '{SWITCHOVER_FLAG_SSM_PATH}' has an invalid value: '{switchover_flag}'. Expected 'auto', 'force_healthy', or 'force_unhealthy'. Health check defaulting to UNHEALTHY."
 
     except ClientError as e:
         logger.error(f"AWS Client Error during main execution (SSM or CloudWatch): {e}")
@@ -200,13 +346,6 @@ def lambda_handler(event, context):
         status_code = 500
         notification_subject = "Health Check Alert: CRITICAL - AWS API Error"
         notification_message = f"The health check Lambda encountered an AWS API error: {e}. Health check defaulting to UNHEALTHY."
-    except json.JSONDecodeError as e:
-        logger.error(f"Error parsing JSON from SSM parameter: {e}. Ensure SERVICE_HEALTH_ENDPOINTS_SSM_PATH contains valid JSON.")
-        final_published_metric_value = 0
-        overall_status = "UNHEALTHY"
-        status_code = 500
-        notification_subject = "Health Check Alert: CRITICAL - Invalid JSON in SSM"
-        notification_message = f"The SSM parameter '{SERVICE_HEALTH_ENDPOINTS_SSM_PATH}' contains invalid JSON: {e}. Health check defaulting to UNHEALTHY."
     except Exception as e:
         logger.error(f"An unexpected error occurred during main execution: {e}", exc_info=True)
         final_published_metric_value = 0
@@ -214,18 +353,35 @@ def lambda_handler(event, context):
         status_code = 500
         notification_subject = "Health Check Alert: CRITICAL - Unexpected Error"
         notification_message = f"The health check Lambda encountered an unexpected error: {e}. Health check defaulting to UNHEALTHY."
-    
-    # Always publish the BinaryHealthCheck metric with the determined value
-    publish_cloudwatch_metric(
-        CLOUDWATCH_NAMESPACE,
-        CLOUDWATCH_METRIC_NAME,
-        final_published_metric_value,
-        CLOUDWATCH_METRIC_UNIT,
-        dimensions
-    )
 
-    # Send SNS notification based on the determined status and context
-    send_sns_notification(notification_subject, notification_message)
+    # Always publish the BinaryHealthCheck metric with the determined value (unless the
+    # early publish already sent it) while the SNS notification goes out concurrently
+    final_steps = [asyncio.to_thread(send_sns_notification, notification_subject, notification_message)]
+    if early_publish_task is not None:
+        final_steps.append(early_publish_task)
+    if early_publish_task is None or early_published_value != final_published_metric_value:
+        final_steps.append(asyncio.to_thread(
+            publish_cloudwatch_metric, CLOUDWATCH_NAMESPACE, CLOUDWATCH_METRIC_NAME, final_published_metric_value, CLOUDWATCH_METRIC_UNIT, dimensions
+        ))
+
+    # Local health history (a no-op unless HEALTH_TIMESERIES_DIR is set)
+    timeseries_samples = [('healthcheck', 'published', final_published_metric_value == 1, final_published_metric_value * 100.0)]
+    if actual_health_evaluated:
+        timeseries_samples.append(('healthcheck', 'actual', actual_health_status == 1, actual_health_status * 100.0))
+    timeseries_samples.extend(('endpoint', name, healthy, 100.0 if healthy else 0.0) for name, healthy in probe_results.items())
+    final_steps.append(asyncio.to_thread(record_health_samples, timeseries_samples))
+    await asyncio.gather(*final_steps)
+
+    summary.set(
+        switchover_flag_mode=switchover_flag,
+        actual_health_check_result=actual_health_status,
+        probed_services=probed_services_count,
+        published_binary_health_value=final_published_metric_value,
+        overall_status=overall_status,
+        failed_services=failed_services,
+        notification_subject=notification_subject
+    )
+    summary.emit()
 
     return {
         'statusCode': status_code,
@@ -233,6 +389,7 @@ def lambda_handler(event, context):
             'message': f"Service health check completed. Overall status: {overall_status}.",
             'switchover_flag_mode': switchover_flag,
             'actual_health_check_result': actual_health_status,
+            'probed_services': probed_services_count,
             'published_binary_health_value': final_published_metric_value,
             'published_cloudwatch_namespace': CLOUDWATCH_NAMESPACE,
             'notification_sent': notification_subject # Indicate notification attempt
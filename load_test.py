@@ -0,0 +1,390 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import threading
+import http.server
+import socketserver
+import multiprocessing
+import importlib.util
+import importlib.machinery
+from collections import Counter
+
+# The handlers create boto3 clients at import time; every call here goes to the
+# simulated backend, but client creation still needs a region
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+from simulated_backend import (
+    SimulatedFleet,
+    SimulatedElbv2Client,
+    SimulatedCloudWatchClient,
+    SimulatedEcsClient,
+    SimulatedSsmClient,
+    SimulatedSnsClient
+)
+
+# --- Load Test: health Lambdas against the simulated backend ---
+# Runs concurrent execution environments (one process each, so module-level
+# clients and caches behave as they do in Lambda) of step5.handler, code.handler,
+# healthcheck.lambda_handler and the lambda-python monitor. Sweeps fleet size and
+# injected API latency, and reports throughput, latency percentiles, API calls per
+# invocation, and points that would exceed the Lambda timeout or API rate limits.
+#
+# Invocations run back to back to measure latency under contention, so the raw call
+# rate of the sweep says nothing about throttling. Rate limits are instead checked
+# against the per-invocation call counts at the real cadence, twice: sustained over
+# the schedule (calls per invocation x scheduled executions per tick / schedule
+# interval) and in-run, while one tick's executions issue their calls within the
+# median invocation duration. The worse of the two is flagged per bucket.
+#
+# Usage: python load_test.py --fleet-sizes 10,100,300 --latencies-ms 0,20,50 --concurrency 4
+
+HANDLERS = ('step5', 'code', 'healthcheck', 'lambda-python')
+
+# Sustained requests/second per account and region used for the rate-limit check.
+# A bare service name is a bucket shared by all of that service's operations.
+# These are default quotas; check Service Quotas for the account being planned.
+API_RATE_LIMITS = {
+    'elbv2': 10.0, # Describe* calls share one bucket
+    'ecs.DescribeServices': 20.0,
+    'ecs.UpdateService': 1.0,
+    'ssm.GetParameter': 40.0,
+    'cloudwatch.PutMetricData': 500.0,
+    'sns.Publish': 300.0
+}
+
+NEAR_TIMEOUT_FRACTION = 0.8
+
+SIMULATED_CLUSTER_NAME = 'sim-cluster'
+SWITCHOVER_FLAG_PATH = '/load-test/switchover-flag'
+SERVICE_ENDPOINTS_PATH = '/load-test/service-endpoints'
+
+# --- Local HTTP fleet for healthcheck probes ---
+
+class _ProbeHandler(http.server.BaseHTTPRequestHandler):
+    probe_latency_seconds = 0.0
+
+    def do_GET(self):
+        if self.probe_latency_seconds:
+            time.sleep(self.probe_latency_seconds)
+        self.send_response(503 if 'down=1' in self.path else 200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+def start_http_fleet(probe_latency_seconds):
+    """
+    Serves /svc/<n> on an ephemeral localhost port; '?down=1' answers 503.
+    Returns (server, base_url).
+    """
+    handler_class = type('ProbeHandler', (_ProbeHandler,), {'probe_latency_seconds': probe_latency_seconds})
+    server_class = type('HttpFleetServer', (socketserver.ThreadingTCPServer,), {'request_queue_size': 256})
+    server = server_class(('127.0.0.1', 0), handler_class)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='http-fleet', daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def build_service_endpoints(base_url, fleet_size, unhealthy_fraction, seed=0):
+    rng = random.Random(seed)
+    return [
+        {'name': f"svc-{index}", 'url': f"{base_url}/svc/{index}" + ('?down=1' if rng.random() < unhealthy_fraction else '')}
+        for index in range(fleet_size)
+    ]
+
+# --- Handler installation (runs inside each execution environment) ---
+
+def load_source_module(module_name, file_name):
+    """
+    Imports a handler from a file by path, which also covers 'lambda-python'
+    (no .py suffix) and keeps 'code.py' from colliding with the stdlib module.
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), file_name)
+    loader = importlib.machinery.SourceFileLoader(module_name, path)
+    spec = importlib.util.spec_from_loader(module_name, loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    loader.exec_module(module)
+    return module
+
+def install_handler(handler_name, fleet_size, latency_seconds, options):
+    """
+    Imports a handler with its AWS clients replaced by simulated ones.
+    Returns (invoke, clients); invoke() runs one invocation.
+    """
+    from request_coalescing import coalescing_client
+
+    fleet = SimulatedFleet(
+        alb_count=1,
+        target_groups_per_alb=fleet_size,
+        targets_per_group=options['targets_per_group'],
+        unhealthy_fraction=options['unhealthy_fraction']
+    )
+    cloudwatch = SimulatedCloudWatchClient(fleet, latency_seconds)
+
+    if handler_name in ('step5', 'code'):
+        os.environ['LOAD_BALANCER_NAME'] = fleet.load_balancer_names[0]
+        elbv2 = SimulatedElbv2Client(fleet, latency_seconds)
+        module = load_source_module(handler_name, f"{handler_name}.py")
+        module.elbv2_client = coalescing_client(elbv2)
+        module.metric_publisher.client = cloudwatch
+        if handler_name == 'code':
+            return (lambda: asyncio.run(module.handler({}, None))), [elbv2, cloudwatch]
+        return (lambda: module.handler({}, None)), [elbv2, cloudwatch]
+
+    if handler_name == 'healthcheck':
+        os.environ['SWITCHOVER_FLAG_SSM_PATH'] = SWITCHOVER_FLAG_PATH
+        os.environ['SERVICE_HEALTH_ENDPOINTS_SSM_PATH'] = SERVICE_ENDPOINTS_PATH
+        os.environ.setdefault('SNS_TOPIC_ARN_FOR_ALERTS', f"arn:aws:sns:{fleet.region_name}:123456789012:load-test")
+        endpoints = build_service_endpoints(options['probe_base_url'], fleet_size, options['unhealthy_fraction'])
+        ssm = SimulatedSsmClient(fleet, latency_seconds, {
+            SWITCHOVER_FLAG_PATH: options['switchover_flag'],
+            SERVICE_ENDPOINTS_PATH: json.dumps(endpoints)
+        })
+        sns = SimulatedSnsClient(fleet, latency_seconds)
+        module = load_source_module('healthcheck', 'healthcheck.py')
+        module.ssm_client = coalescing_client(ssm)
+        module.cloudwatch_client = cloudwatch
+        module.sns_client = sns
+        return (lambda: module.lambda_handler({}, None)), [ssm, cloudwatch, sns]
+
+    if handler_name == 'lambda-python':
+        service_names = [f"svc-{index}" for index in range(fleet_size)]
+        os.environ['CLUSTERS_AND_SERVICES_TO_MONITOR'] = json.dumps([
+            {'cluster_name': SIMULATED_CLUSTER_NAME, 'service_name': service_name} for service_name in service_names
+        ])
+        ecs = SimulatedEcsClient(fleet, latency_seconds, {
+            (SIMULATED_CLUSTER_NAME, service_name): {'desiredCount': 2, 'runningCount': 2} for service_name in service_names
+        })
+        module = load_source_module('lambda_python', 'lambda-python')
+        module.ecs_client = ecs
+        module.metric_publisher.client = cloudwatch
+        return (lambda: module.lambda_handler({}, None)), [ecs, cloudwatch]
+
+    raise ValueError(f"Unknown handler '{handler_name}'. Expected one of {HANDLERS}.")
+
+def _environment_worker(connection, handler_name, fleet_size, latency_seconds, invocations, options):
+    """
+    One simulated execution environment: initializes the handler, then runs
+    invocations back to back and sends its measurements over the pipe.
+    """
+    try:
+        os.environ['LOG_LEVEL'] = options['log_level']
+        init_started = time.perf_counter()
+        invoke, clients = install_handler(handler_name, fleet_size, latency_seconds, options)
+        init_ms = (time.perf_counter() - init_started) * 1000.0
+
+        durations_ms = []
+        status_codes = Counter()
+        loop_started = time.time()
+        for _ in range(invocations):
+            started = time.perf_counter()
+            response = invoke()
+            durations_ms.append((time.perf_counter() - started) * 1000.0)
+            status_codes[str(response.get('statusCode'))] += 1
+        loop_finished = time.time()
+
+        call_counts = Counter()
+        for client in clients:
+            for operation_name, count in client.call_counts.items():
+                call_counts[f"{client.service_name}.{operation_name}"] += count
+
+        connection.send({
+            'init_ms': init_ms,
+            'durations_ms': durations_ms,
+            'status_codes': dict(status_codes),
+            'call_counts': dict(call_counts),
+            'started': loop_started,
+            'finished': loop_finished,
+            'error': None
+        })
+    except Exception as e:
+        connection.send({'error': f"{type(e).__name__}: {e}"})
+    finally:
+        connection.close()
+
+# --- Sweep ---
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(p / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def scheduled_call_rates(calls_per_invocation, scheduled_concurrency, schedule_interval_seconds):
+    """
+    Sustained API rates when scheduled_concurrency executions of the handler start
+    every schedule_interval_seconds.
+    """
+    return {key: calls * scheduled_concurrency / schedule_interval_seconds for key, calls in calls_per_invocation.items()}
+
+def in_run_call_rates(calls_per_invocation, scheduled_concurrency, invocation_seconds):
+    """
+    API rates while one schedule tick's executions are in flight together, assuming
+    each spreads its calls over invocation_seconds. This is the burst a large fleet
+    sends within a few seconds, however long the schedule interval.
+    """
+    if not invocation_seconds:
+        return {}
+    return {key: calls * scheduled_concurrency / invocation_seconds for key, calls in calls_per_invocation.items()}
+
+def check_rate_limits(scheduled_rates, in_run_rates):
+    """
+    Returns ['bucket <scheduled|in-run> rate/s > limit/s', ...] for every rate-limit
+    bucket exceeded, reporting the worse of the scheduled and in-run rates.
+    """
+    def bucket_rate(call_rates, bucket):
+        return sum(r for key, r in call_rates.items() if key == bucket or key.split('.', 1)[0] == bucket)
+
+    violations = []
+    for bucket, limit in API_RATE_LIMITS.items():
+        rate, label = max((bucket_rate(scheduled_rates, bucket), 'scheduled'), (bucket_rate(in_run_rates, bucket), 'in-run'))
+        if rate > limit:
+            violations.append(f"{bucket} {label} {rate:.2f}/s > {limit:g}/s")
+    return violations
+
+def run_point(handler_name, fleet_size, latency_ms, concurrency, invocations, options):
+    """
+    Runs `concurrency` execution environments of a handler at one fleet size and
+    latency, and returns the merged measurements.
+    """
+    processes = []
+    for _ in range(concurrency):
+        parent_connection, child_connection = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(
+            target=_environment_worker,
+            args=(child_connection, handler_name, fleet_size, latency_ms / 1000.0, invocations, options)
+        )
+        process.start()
+        child_connection.close()
+        processes.append((process, parent_connection))
+
+    results = []
+    for process, connection in processes:
+        try:
+            results.append(connection.recv())
+        except EOFError:
+            results.append({'error': f"Environment exited with code {process.exitcode} before reporting."})
+        process.join()
+
+    errors = [result['error'] for result in results if result['error']]
+    results = [result for result in results if not result['error']]
+    durations = sorted(d for result in results for d in result['durations_ms'])
+    status_codes = Counter()
+    call_counts = Counter()
+    for result in results:
+        status_codes.update(result['status_codes'])
+        call_counts.update(result['call_counts'])
+
+    wall_seconds = (max(r['finished'] for r in results) - min(r['started'] for r in results)) if results else 0.0
+    calls_per_invocation = {key: count / len(durations) for key, count in sorted(call_counts.items())} if durations else {}
+    scheduled_rates = scheduled_call_rates(calls_per_invocation, options['scheduled_concurrency'], options['schedule_interval_seconds'])
+    in_run_rates = in_run_call_rates(calls_per_invocation, options['scheduled_concurrency'], percentile(durations, 50) / 1000.0)
+    timeout_ms = options['lambda_timeout_seconds'] * 1000.0
+
+    flags = []
+    if durations and durations[-1] > timeout_ms:
+        flags.append(f"TIMEOUT max {durations[-1] / 1000.0:.1f}s > {options['lambda_timeout_seconds']:g}s")
+    elif durations and percentile(durations, 99) >= NEAR_TIMEOUT_FRACTION * timeout_ms:
+        flags.append(f"NEAR_TIMEOUT p99 {percentile(durations, 99) / 1000.0:.1f}s")
+    flags.extend(f"RATE_LIMIT {violation}" for violation in check_rate_limits(scheduled_rates, in_run_rates))
+    flags.extend(f"ERROR {error}" for error in errors)
+
+    return {
+        'handler': handler_name,
+        'fleet_size': fleet_size,
+        'latency_ms': latency_ms,
+        'concurrency': concurrency,
+        'invocations': len(durations),
+        'throughput_per_s': len(durations) / wall_seconds if wall_seconds else 0.0,
+        'init_ms_max': max((r['init_ms'] for r in results), default=0.0),
+        'p50_ms': percentile(durations, 50),
+        'p95_ms': percentile(durations, 95),
+        'p99_ms': percentile(durations, 99),
+        'max_ms': durations[-1] if durations else 0.0,
+        'status_codes': dict(status_codes),
+        'calls_per_invocation': calls_per_invocation,
+        'scheduled_call_rates_per_s': {key: round(rate, 4) for key, rate in scheduled_rates.items()},
+        'in_run_call_rates_per_s': {key: round(rate, 2) for key, rate in in_run_rates.items()},
+        'flags': flags
+    }
+
+def print_point(point):
+    calls_per_invocation = sum(point['calls_per_invocation'].values())
+    print(
+        f"{point['handler']:>14} {point['fleet_size']:>6} {point['latency_ms']:>8g} "
+        f"{point['throughput_per_s']:>8.2f} {point['p50_ms']:>9.1f} {point['p95_ms']:>9.1f} {point['p99_ms']:>9.1f} "
+        f"{calls_per_invocation:>9.1f}  {'; '.join(point['flags']) or 'ok'}",
+        flush=True
+    )
+
+def parse_list(value, cast):
+    return [cast(item) for item in value.split(',') if item.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the health Lambdas against the simulated AWS backend.")
+    parser.add_argument('--handlers', default=','.join(HANDLERS), help=f"Comma separated subset of {','.join(HANDLERS)}.")
+    parser.add_argument('--fleet-sizes', default='10,50,200', help="Target groups (step5, code), endpoints (healthcheck) or ECS services (lambda-python).")
+    parser.add_argument('--latencies-ms', default='0,20,50', help="Injected per-call AWS API latency.")
+    parser.add_argument('--concurrency', type=int, default=4, help="Concurrent execution environments.")
+    parser.add_argument('--invocations', type=int, default=5, help="Invocations per execution environment.")
+    parser.add_argument('--targets-per-group', type=int, default=20)
+    parser.add_argument('--unhealthy-fraction', type=float, default=0.05)
+    parser.add_argument('--probe-latency-ms', type=float, default=20.0, help="Response time of the local HTTP fleet.")
+    parser.add_argument('--switchover-flag', default='auto')
+    parser.add_argument('--lambda-timeout', type=float, default=30.0, help="Configured Lambda timeout in seconds.")
+    parser.add_argument('--schedule-interval', type=float, default=60.0, help="Seconds between scheduled runs of the handler.")
+    parser.add_argument('--scheduled-concurrency', type=int, default=1, help="Executions of the handler started per schedule tick in the account and region, e.g. one per monitored environment.")
+    parser.add_argument('--log-level', default='ERROR', help="LOG_LEVEL for the handlers under test.")
+    parser.add_argument('--json', help="Also write every point, including per-operation call budgets, to this file.")
+    args = parser.parse_args()
+
+    handlers = parse_list(args.handlers, str)
+    unknown = set(handlers) - set(HANDLERS)
+    if unknown:
+        parser.error(f"Unknown handlers {sorted(unknown)}; expected a subset of {HANDLERS}.")
+
+    server, base_url = start_http_fleet(args.probe_latency_ms / 1000.0)
+    options = {
+        'targets_per_group': args.targets_per_group,
+        'unhealthy_fraction': args.unhealthy_fraction,
+        'probe_base_url': base_url,
+        'switchover_flag': args.switchover_flag,
+        'lambda_timeout_seconds': args.lambda_timeout,
+        'schedule_interval_seconds': args.schedule_interval,
+        'scheduled_concurrency': args.scheduled_concurrency,
+        'log_level': args.log_level
+    }
+    logging.basicConfig(level=args.log_level)
+
+    print(f"{args.concurrency} concurrent environments x {args.invocations} back-to-back invocations per point, Lambda timeout {args.lambda_timeout:g}s")
+    print(f"Rate limits are checked for {args.scheduled_concurrency} scheduled executions every {args.schedule_interval:g}s, sustained and within one run.")
+    print(f"{'handler':>14} {'fleet':>6} {'api_ms':>8} {'inv/s':>8} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9} {'calls/inv':>9}  flags")
+
+    points = []
+    try:
+        for handler_name in handlers:
+            for fleet_size in parse_list(args.fleet_sizes, int):
+                for latency_ms in parse_list(args.latencies_ms, float):
+                    point = run_point(handler_name, fleet_size, latency_ms, args.concurrency, args.invocations, options)
+                    points.append(point)
+                    print_point(point)
+    finally:
+        server.shutdown()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(points, f, indent=2)
+        print(f"Wrote {len(points)} points to {args.json}")
+
+    flagged = [point for point in points if point['flags']]
+    if flagged:
+        print(f"{len(flagged)} of {len(points)} points exceed the Lambda timeout or API rate limits, or failed.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+import os
+import queue
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+from botocore.config import Config
+
+# Configure logging
+logger = logging.getLogger()
+
+# --- Background Metric Publisher ---
+# Handlers enqueue datums and carry on evaluating while a background thread sends
+# them over one keep-alive CloudWatch connection, batched per namespace. Before
+# returning, a handler drains the queue with a bounded timeout so nothing is left
+# behind when the execution environment freezes. Datums that could not be queued
+# or sent are counted and reported as DroppedMetricDatums in their namespace.
+
+METRIC_PUBLISHER_QUEUE_SIZE = int(os.environ.get('METRIC_PUBLISHER_QUEUE_SIZE', '1000'))
+METRIC_PUBLISHER_DRAIN_TIMEOUT_SECONDS = float(os.environ.get('METRIC_PUBLISHER_DRAIN_TIMEOUT_SECONDS', '5'))
+
+MAX_DATUMS_PER_REQUEST = 1000 # PutMetricData limit
+DROPPED_METRIC_NAME = 'DroppedMetricDatums'
+
+# For the publisher's CloudWatch client: the worker reuses one pooled TLS connection
+publisher_client_config = Config(
+    tcp_keepalive=True,
+    max_pool_connections=2,
+    retries={'max_attempts': 3, 'mode': 'standard'}
+)
+
+class MetricPublisher:
+    """
+    Queue plus background sender for CloudWatch datums. Keep one instance at
+    module level; the worker thread starts on first use and survives warm
+    invocations.
+    """
+
+    def __init__(self, client, queue_size=METRIC_PUBLISHER_QUEUE_SIZE):
+        self.client = client
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._unfinished = 0 # Queued or in-flight datums
+        self._thread = None
+        self._dropped = Counter() # namespace -> datums not yet reported as dropped
+        self._stats = Counter() # Per-drain 'sent' / 'dropped' counts
+
+    def put(self, namespace, metric_data):
+        """
+        Queues datums for namespace without blocking. Datums without a Timestamp are
+        stamped now, so a delayed send still records when they were measured.
+        Returns False if any datum was dropped because the queue is full.
+        """
+        self._ensure_worker()
+        accepted = True
+        for datum in metric_data:
+            if 'Timestamp' not in datum:
+                datum = dict(datum, Timestamp=datetime.now(timezone.utc))
+            with self._lock:
+                self._unfinished += 1
+            try:
+                self._queue.put_nowait((namespace, datum))
+            except queue.Full:
+                self._finish([(namespace, datum)], sent=False)
+                accepted = False
+        if not accepted:
+            logger.warning("Metric publisher queue is full; dropped datums for namespace '%s'.", namespace)
+        return accepted
+
+    def flush(self, timeout=METRIC_PUBLISHER_DRAIN_TIMEOUT_SECONDS):
+        """
+        Waits up to timeout seconds for queued datums to be sent, then queues (and
+        waits for) a DroppedMetricDatums report for anything dropped or failed.
+        Returns the sent / dropped / pending datum counts since the previous flush.
+        """
+        deadline = time.monotonic() + timeout
+        self._wait_idle(deadline)
+
+        with self._lock:
+            dropped = dict(self._dropped)
+            self._dropped.clear()
+        for namespace, count in dropped.items():
+            self.put(namespace, [{'MetricName': DROPPED_METRIC_NAME, 'Value': float(count), 'Unit': 'Count'}])
+        if dropped:
+            self._wait_idle(deadline)
+
+        with self._lock:
+            stats = {
+                'metric_datums_sent': self._stats['sent'],
+                'metric_datums_dropped': self._stats['dropped'],
+                'metric_datums_pending': self._unfinished
+            }
+            self._stats.clear()
+        if stats['metric_datums_pending']:
+            logger.warning("Metric publisher drain timed out with %d datums still queued.", stats['metric_datums_pending'])
+        return stats
+
+    def _wait_idle(self, deadline):
+        with self._idle:
+            while self._unfinished:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='metric-publisher', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            # Coalesce whatever else is already queued into the same requests
+            while len(items) < MAX_DATUMS_PER_REQUEST:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            batches = defaultdict(list)
+            for namespace, datum in items:
+                batches[namespace].append(datum)
+            for namespace, metric_data in batches.items():
+                self._send(namespace, metric_data)
+
+    def _send(self, namespace, metric_data):
+        try:
+            self.client.put_metric_data(Namespace=namespace, MetricData=metric_data)
+            logger.debug("Published %d datums to namespace '%s'.", len(metric_data), namespace)
+            self._finish([(namespace, datum) for datum in metric_data], sent=True)
+        except Exception as e:
+            logger.error(f"Error publishing {len(metric_data)} datums to namespace '{namespace}': {e}")
+            self._finish([(namespace, datum) for datum in metric_data], sent=False)
+
+    def _finish(self, items, sent):
+        with self._idle:
+            for namespace, datum in items:
+                if sent:
+                    self._stats['sent'] += 1
+                elif datum['MetricName'] == DROPPED_METRIC_NAME:
+                    # A lost report carries its count over to the next one
+                    self._dropped[namespace] += int(datum['Value'])
+                else:
+                    self._stats['dropped'] += 1
+                    self._dropped[namespace] += 1
+            self._unfinished -= len(items)
+            if not self._unfinished:
+                self._idle.notify_all()
@@ -0,0 +1,119 @@
+import json
+import logging
+import threading
+from concurrent.futures import Future
+
+# Configure logging
+logger = logging.getLogger()
+
+# Read-only API calls that are safe to share between callers. Anything not listed
+# here (put_metric_data, publish, update_service, paginators, ...) is passed straight
+# through to the underlying boto3 client.
+COALESCED_OPERATIONS = {
+    'elbv2': {
+        'describe_load_balancers',
+        'describe_listeners',
+        'describe_rules',
+        'describe_target_groups',
+        'describe_target_health',
+    },
+    'ecs': {
+        'describe_services',
+        'describe_clusters',
+        'list_services',
+    },
+    'ssm': {
+        'get_parameter',
+        'get_parameters',
+    },
+}
+
+class SingleFlight:
+    """
+    Coalesces identical requests: concurrent callers with the same key share a
+    single in-flight call, and completed results are memoized until reset().
+    Failed calls are never memoized, so the next caller retries.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.hits = 0
+        self.misses = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._calls[key] = future
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if not is_owner:
+            # Either already memoized or still in flight on another thread
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                self._calls.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        future.set_result(result)
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._calls.clear()
+            self.hits = 0
+            self.misses = 0
+
+class CoalescingClient:
+    """
+    Thin proxy around a boto3 client that routes the read calls listed in
+    COALESCED_OPERATIONS through a SingleFlight group. Responses are shared
+    between callers and must be treated as read-only.
+    """
+
+    def __init__(self, client, single_flight):
+        self._client = client
+        self._single_flight = single_flight
+        self._service_name = client.meta.service_model.service_name
+        self._region_name = client.meta.region_name
+        self._operations = COALESCED_OPERATIONS.get(self._service_name, set())
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name not in self._operations:
+            return attr
+
+        def coalesced_call(**kwargs):
+            key = (self._service_name, self._region_name, name, json.dumps(kwargs, sort_keys=True, default=str))
+            return self._single_flight.do(key, lambda: attr(**kwargs))
+
+        return coalesced_call
+
+# Shared by every module in the process so that identical calls coalesce across
+# concurrent checks, not just within one of them.
+_invocation_single_flight = SingleFlight()
+
+def coalescing_client(client):
+    """
+    Wraps a boto3 client so its read calls are coalesced and memoized for the
+    duration of the current invocation.
+    """
+    return CoalescingClient(client, _invocation_single_flight)
+
+def reset_invocation_cache():
+    """
+    Drops memoized responses. Handlers call this at the start of every invocation
+    so results never leak across warm invocations.
+    """
+    if _invocation_single_flight.hits or _invocation_single_flight.misses:
+        logger.debug(f"Request coalescing stats for previous invocation: {_invocation_single_flight.hits} shared, {_invocation_single_flight.misses} issued.")
+    _invocation_single_flight.reset()
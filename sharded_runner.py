@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import logging
+import multiprocessing
+import boto3
+
+from step5 import get_load_balancer_arn, get_target_group_arns_from_alb, publish_cloudwatch_metric, metric_publisher
+from request_coalescing import reset_invocation_cache
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+
+# --- Sharded Evaluation ---
+# botocore response parsing is CPU bound and serialized by the GIL, so very large
+# fleets are split across worker processes. Workers are plain Process + Pipe pairs:
+# Lambda has no /dev/shm, which rules out multiprocessing.Pool and Queue.
+#
+# Workers that do not report before the deadline (hung, or killed for memory) are
+# terminated and their target groups marked unknown: the verdict is taken over the
+# target groups that were evaluated, and a run with none evaluated fails.
+
+# Shard deadline without a Lambda context (local runs); in Lambda the remaining time is used
+SHARD_TIMEOUT_SECONDS = float(os.environ.get('SHARD_TIMEOUT_SECONDS', '120'))
+# Time kept back from the Lambda deadline to merge, publish and return
+DEADLINE_SAFETY_MARGIN_SECONDS = 5.0
+
+def default_elbv2_client_factory():
+    """
+    Creates the ELBv2 client a worker process uses. Every worker builds its own
+    client; boto3 clients and their connection pools are not shared across forks.
+    """
+    return boto3.client('elbv2')
+
+def get_worker_count():
+    """
+    Number of worker processes: SHARD_WORKER_COUNT if set, otherwise one per vCPU
+    available to the Lambda (which scales with the configured memory size).
+    """
+    configured = os.environ.get('SHARD_WORKER_COUNT')
+    if configured:
+        return max(1, int(configured))
+    return os.cpu_count() or 1
+
+def evaluate_shard(target_group_arns, client_factory=default_elbv2_client_factory):
+    """
+    Evaluates a shard of target groups and returns compact result tuples:
+    (target_group_arn, healthy_targets, total_targets, error_message_or_None).
+    Target groups of a shard that never reported have None counts (unknown).
+    """
+    elbv2_client = client_factory()
+    results = []
+    for tg_arn in target_group_arns:
+        try:
+            descriptions = elbv2_client.describe_target_health(TargetGroupArn=tg_arn).get('TargetHealthDescriptions', [])
+            healthy_targets = sum(1 for description in descriptions if description['TargetHealth']['State'] == 'healthy')
+            results.append((tg_arn, healthy_targets, len(descriptions), None))
+        except Exception as e:
+            results.append((tg_arn, 0, 0, str(e)))
+    return results
+
+def _shard_worker(target_group_arns, client_factory, conn):
+    """
+    Worker process entry point: evaluates its shard and sends the tuples back.
+    """
+    try:
+        conn.send(evaluate_shard(target_group_arns, client_factory))
+    except Exception as e:
+        conn.send([(tg_arn, 0, 0, f"Worker failed: {e}") for tg_arn in target_group_arns])
+    finally:
+        conn.close()
+
+def get_shard_deadline(context):
+    """
+    Returns the time.monotonic() deadline for shard results: the Lambda's remaining
+    time less a safety margin, or SHARD_TIMEOUT_SECONDS without a context.
+    """
+    if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+        return time.monotonic() + context.get_remaining_time_in_millis() / 1000.0 - DEADLINE_SAFETY_MARGIN_SECONDS
+    return time.monotonic() + SHARD_TIMEOUT_SECONDS
+
+def run_sharded(target_group_arns, worker_count=None, client_factory=default_elbv2_client_factory, deadline=None):
+    """
+    Splits target groups round-robin across worker processes and returns the
+    concatenated result tuples. A single worker runs in-process. Workers that have
+    not reported by deadline (time.monotonic() based, defaults to SHARD_TIMEOUT_SECONDS
+    from now) are terminated and their target groups returned as unknown.
+    """
+    worker_count = min(worker_count or get_worker_count(), len(target_group_arns))
+    if worker_count <= 1:
+        return evaluate_shard(target_group_arns, client_factory)
+
+    if deadline is None:
+        deadline = time.monotonic() + SHARD_TIMEOUT_SECONDS
+    shards = [target_group_arns[i::worker_count] for i in range(worker_count)]
+    workers = []
+    for shard in shards:
+        parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(target=_shard_worker, args=(shard, client_factory, child_conn))
+        process.start()
+        child_conn.close() # Parent only reads
+        workers.append((shard, process, parent_conn))
+
+    results = []
+    for shard, process, parent_conn in workers:
+        try:
+            if parent_conn.poll(max(0.0, deadline - time.monotonic())):
+                results.extend(parent_conn.recv())
+            else:
+                logger.error(f"Shard worker {process.pid} did not report before the deadline; terminating it and marking {len(shard)} target groups unknown.")
+                process.terminate()
+                results.extend((tg_arn, None, None, 'Worker timed out') for tg_arn in shard)
+        except EOFError:
+            logger.error(f"Shard worker {process.pid} exited with code {process.exitcode} without reporting; marking {len(shard)} target groups unknown.")
+            results.extend((tg_arn, None, None, 'Worker exited without returning results') for tg_arn in shard)
+        finally:
+            parent_conn.close()
+        process.join()
+    return results
+
+def merge_shard_results(results, healthy_threshold_percentage):
+    """
+    Merges result tuples into the same aggregate step5 reports: a target group is
+    healthy when it has at least one healthy target, and no target groups at all
+    counts as 100% healthy. Unknown target groups (from shards that never reported)
+    are left out of the percentage and listed under 'unknown'.
+    """
+    unknown = {tg_arn: error for tg_arn, healthy_targets, _, error in results if healthy_targets is None}
+    results = [result for result in results if result[1] is not None]
+    total_tg_count = len(results)
+    healthy_tg_count = sum(1 for _, healthy_targets, _, _ in results if healthy_targets > 0)
+    errors = {tg_arn: error for tg_arn, _, _, error in results if error}
+
+    healthy_percentage = (healthy_tg_count / total_tg_count) * 100 if total_tg_count else 100.0
+    binary_health_metric_value = 1 if healthy_percentage >= healthy_threshold_percentage else 0
+
+    return {
+        'total_target_groups': total_tg_count,
+        'healthy_target_groups': healthy_tg_count,
+        'healthy_percentage': healthy_percentage,
+        'binary_health_metric_value': binary_health_metric_value,
+        'errors': errors,
+        'unknown': unknown
+    }
+
+# --- Main Lambda Handler ---
+
+def handler(event, context):
+    """
+    Lambda function entry point for fleet-scale ALB health checks. Discovers the
+    target groups of every ALB in LOAD_BALANCER_NAMES (comma separated, falls back
+    to LOAD_BALANCER_NAME), evaluates them across a process pool and publishes the
+    same BinaryHealthCheck metric as step5.
+    """
+    reset_invocation_cache()
+    load_balancer_names = [name.strip() for name in os.environ.get('LOAD_BALANCER_NAMES', os.environ.get('LOAD_BALANCER_NAME', '')).split(',') if name.strip()]
+    healthy_threshold_percentage_str = os.environ.get('HEALTHY_THRESHOLD_PERCENTAGE', '75')
+    cloudwatch_namespace = "CTSI/HealthChecks"
+
+    if not load_balancer_names:
+        logger.error("Neither LOAD_BALANCER_NAMES nor LOAD_BALANCER_NAME environment variable is set.")
+        return {
+            'statusCode': 400,
+            'body': json.dumps('Error: LOAD_BALANCER_NAMES environment variable is missing.')
+        }
+
+    try:
+        healthy_threshold_percentage = float(healthy_threshold_percentage_str)
+        if not (0 <= healthy_threshold_percentage <= 100):
+            raise ValueError("HEALTHY_THRESHOLD_PERCENTAGE must be between 0 and 100.")
+    except ValueError as e:
+        logger.error(f"Invalid HEALTHY_THRESHOLD_PERCENTAGE: {e}")
+        return {
+            'statusCode': 400,
+            'body': json.dumps(f'Error: Invalid HEALTHY_THRESHOLD_PERCENTAGE environment variable: {e}')
+        }
+
+    try:
+        # Step 1: Discover target groups across all ALBs (cheap, stays in-process)
+        target_group_arns = []
+        for load_balancer_name in load_balancer_names:
+            alb_arn = get_load_balancer_arn(load_balancer_name)
+            if not alb_arn:
+                raise RuntimeError(f"ALB '{load_balancer_name}' not found.")
+            target_group_arns.extend(get_target_group_arns_from_alb(alb_arn))
+        target_group_arns = list(dict.fromkeys(target_group_arns)) # ALBs may share target groups
+
+        # Step 2: Evaluate target health across the process pool
+        worker_count = get_worker_count()
+        logger.info(f"Evaluating {len(target_group_arns)} target groups from {len(load_balancer_names)} ALBs across {worker_count} worker processes.")
+        summary = merge_shard_results(run_sharded(target_group_arns, worker_count, deadline=get_shard_deadline(context)), healthy_threshold_percentage)
+
+        if summary['errors']:
+            raise RuntimeError(f"Failed to evaluate {len(summary['errors'])} target groups, e.g. {next(iter(summary['errors'].items()))}")
+        if summary['unknown']:
+            if not summary['total_target_groups']:
+                raise RuntimeError(f"No target groups were evaluated; all {len(summary['unknown'])} are unknown.")
+            logger.warning(f"{len(summary['unknown'])} target groups are unknown (shard workers did not report); health is based on the {summary['total_target_groups']} evaluated.")
+
+        overall_status = "HEALTHY" if summary['binary_health_metric_value'] == 1 else "UNHEALTHY"
+        logger.info(f"Overall fleet health: {summary['healthy_target_groups']}/{summary['total_target_groups']} target groups healthy ({summary['healthy_percentage']:.2f}%).")
+
+        publish_cloudwatch_metric(
+            cloudwatch_namespace,
+            'BinaryHealthCheck',
+            summary['binary_health_metric_value'],
+            'Count',
+            []
+        )
+
+        return {
+            'statusCode': 200 if overall_status == "HEALTHY" else 500,
+            'body': json.dumps({
+                'message': f"Fleet health check completed. Overall status: {overall_status}.",
+                'alb_names': load_balancer_names,
+                'worker_count': worker_count,
+                'total_target_groups': summary['total_target_groups'],
+                'healthy_target_groups': summary['healthy_target_groups'],
+                'unknown_target_groups': len(summary['unknown']),
+                'healthy_percentage': f"{summary['healthy_percentage']:.2f}%",
+                'threshold_percentage': f"{healthy_threshold_percentage}%",
+                'overall_status': overall_status,
+                'published_binary_health_value': summary['binary_health_metric_value'],
+                'published_cloudwatch_namespace': cloudwatch_namespace
+            })
+        }
+
+    except Exception as e:
+        logger.error(f"Lambda execution failed during fleet health check: {e}", exc_info=True)
+        publish_cloudwatch_metric(
+            cloudwatch_namespace,
+            'BinaryHealthCheck',
+            0, # 0 means unhealthy on error
+            'Count',
+            []
+        )
+        return {
+            'statusCode': 500,
+            'body': json.dumps(f'Internal Server Error: {e}')
+        }
+    finally:
+        metric_publisher.flush()
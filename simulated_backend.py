@@ -0,0 +1,216 @@
+import json
+import random
+import time
+import threading
+from collections import Counter
+from types import SimpleNamespace
+
+from botocore.exceptions import ClientError
+
+# --- Simulated AWS backend for local benchmarks ---
+# Stand-in clients that answer the same calls the health Lambdas make, with the
+# same response shapes. Every response is round-tripped through JSON so callers
+# pay a parsing cost comparable to botocore deserializing a real response.
+
+ACCOUNT_ID = '123456789012'
+
+class SimulatedFleet:
+    """
+    A deterministic fleet of ALBs, listeners, target groups and targets.
+    """
+
+    def __init__(self, alb_count=1, target_groups_per_alb=10, targets_per_group=20,
+                 unhealthy_fraction=0.0, region_name='us-east-1', seed=0):
+        rng = random.Random(seed)
+        self.region_name = region_name
+        self.load_balancers = {} # name -> ARN
+        self.listeners = {} # ALB ARN -> [listener ARN]
+        self.rules = {} # listener ARN -> [rule]
+        self.target_health = {} # target group ARN -> [TargetHealthDescription]
+
+        for alb_index in range(alb_count):
+            alb_name = f"sim-alb-{alb_index}"
+            alb_arn = f"arn:aws:elasticloadbalancing:{region_name}:{ACCOUNT_ID}:loadbalancer/app/{alb_name}/{alb_index:016x}"
+            listener_arn = f"arn:aws:elasticloadbalancing:{region_name}:{ACCOUNT_ID}:listener/app/{alb_name}/{alb_index:016x}/{alb_index:016x}"
+            self.load_balancers[alb_name] = alb_arn
+            self.listeners[alb_arn] = [listener_arn]
+            self.rules[listener_arn] = []
+
+            for tg_index in range(target_groups_per_alb):
+                tg_name = f"sim-tg-{alb_index}-{tg_index}"
+                tg_arn = f"arn:aws:elasticloadbalancing:{region_name}:{ACCOUNT_ID}:targetgroup/{tg_name}/{tg_index:016x}"
+                self.rules[listener_arn].append({
+                    'RuleArn': f"{listener_arn}/rule-{tg_index}",
+                    'Actions': [{
+                        'Type': 'forward',
+                        'TargetGroupArn': tg_arn,
+                        'ForwardConfig': {'TargetGroups': [{'TargetGroupArn': tg_arn, 'Weight': 1}]}
+                    }]
+                })
+                descriptions = []
+                for target_index in range(targets_per_group):
+                    state = 'unhealthy' if rng.random() < unhealthy_fraction else 'healthy'
+                    description = {
+                        'Target': {'Id': f"10.{alb_index % 256}.{tg_index % 256}.{target_index % 256}", 'Port': 8080},
+                        'HealthCheckPort': '8080',
+                        'TargetHealth': {'State': state}
+                    }
+                    if state != 'healthy':
+                        description['TargetHealth']['Reason'] = 'Target.FailedHealthChecks'
+                    descriptions.append(description)
+                self.target_health[tg_arn] = descriptions
+
+    @property
+    def load_balancer_names(self):
+        return list(self.load_balancers)
+
+    @property
+    def target_group_arns(self):
+        return list(self.target_health)
+
+class SimulatedClient:
+    """
+    Base class for simulated service clients: injects latency, counts calls and
+    round-trips every response through JSON.
+    """
+
+    service_name = None
+
+    def __init__(self, fleet, latency_seconds=0.0):
+        self.fleet = fleet
+        self.latency_seconds = latency_seconds
+        self.call_counts = Counter()
+        self._lock = threading.Lock()
+        self.meta = SimpleNamespace(
+            service_model=SimpleNamespace(service_name=self.service_name),
+            region_name=fleet.region_name
+        )
+
+    def _respond(self, operation_name, payload):
+        with self._lock:
+            self.call_counts[operation_name] += 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        return json.loads(json.dumps(payload))
+
+    def get_paginator(self, operation_name):
+        """
+        boto3-style paginator; simulated responses always fit in one page.
+        """
+        operation = getattr(self, operation_name)
+        return SimpleNamespace(paginate=lambda **kwargs: iter([operation(**kwargs)]))
+
+class SimulatedElbv2Client(SimulatedClient):
+    service_name = 'elbv2'
+
+    def describe_load_balancers(self, Names=None, **kwargs):
+        names = Names or self.fleet.load_balancer_names
+        load_balancers = [
+            {'LoadBalancerName': name, 'LoadBalancerArn': self.fleet.load_balancers[name], 'Type': 'application'}
+            for name in names if name in self.fleet.load_balancers
+        ]
+        return self._respond('DescribeLoadBalancers', {'LoadBalancers': load_balancers})
+
+    def describe_listeners(self, LoadBalancerArn, **kwargs):
+        listeners = [
+            {'ListenerArn': arn, 'LoadBalancerArn': LoadBalancerArn, 'Port': 443, 'Protocol': 'HTTPS'}
+            for arn in self.fleet.listeners.get(LoadBalancerArn, [])
+        ]
+        return self._respond('DescribeListeners', {'Listeners': listeners})
+
+    def describe_rules(self, ListenerArn, **kwargs):
+        return self._respond('DescribeRules', {'Rules': self.fleet.rules.get(ListenerArn, [])})
+
+    def describe_target_health(self, TargetGroupArn, **kwargs):
+        return self._respond('DescribeTargetHealth', {'TargetHealthDescriptions': self.fleet.target_health.get(TargetGroupArn, [])})
+
+class SimulatedCloudWatchClient(SimulatedClient):
+    service_name = 'cloudwatch'
+
+    def __init__(self, fleet, latency_seconds=0.0):
+        super().__init__(fleet, latency_seconds)
+        self.published = []
+
+    def put_metric_data(self, Namespace, MetricData, **kwargs):
+        with self._lock:
+            self.published.extend((Namespace, datum) for datum in MetricData)
+        return self._respond('PutMetricData', {})
+
+class SimulatedEcsClient(SimulatedClient):
+    """
+    Simulated ECS: services scale toward their desiredCount by
+    tasks_started_per_describe running tasks every time they are described.
+    """
+
+    service_name = 'ecs'
+
+    # Modeled exceptions, referenced by callers as client.exceptions.<Name>
+    exceptions = SimpleNamespace(
+        ClusterNotFoundException=type('ClusterNotFoundException', (Exception,), {}),
+        ServiceNotFoundException=type('ServiceNotFoundException', (Exception,), {})
+    )
+
+    def __init__(self, fleet, latency_seconds=0.0, services=None, tasks_started_per_describe=1):
+        super().__init__(fleet, latency_seconds)
+        self.tasks_started_per_describe = tasks_started_per_describe
+        # (cluster_name, service_name) -> {'desiredCount': int, 'runningCount': int}
+        self.services = {key: dict(counts) for key, counts in (services or {}).items()}
+
+    def _service_arn(self, cluster, service_name):
+        return f"arn:aws:ecs:{self.fleet.region_name}:{ACCOUNT_ID}:service/{cluster}/{service_name}"
+
+    def _service_description(self, cluster, service_name):
+        counts = self.services[(cluster, service_name)]
+        return {
+            'serviceArn': self._service_arn(cluster, service_name),
+            'serviceName': service_name,
+            'clusterArn': f"arn:aws:ecs:{self.fleet.region_name}:{ACCOUNT_ID}:cluster/{cluster}",
+            'desiredCount': counts['desiredCount'],
+            'runningCount': counts['runningCount'],
+            'loadBalancers': []
+        }
+
+    def describe_services(self, cluster, services, **kwargs):
+        found, failures = [], []
+        with self._lock:
+            for service in services:
+                service_name = service.rsplit('/', 1)[-1] # Accepts a service name or ARN
+                counts = self.services.get((cluster, service_name))
+                if counts is None:
+                    failures.append({'arn': self._service_arn(cluster, service_name), 'reason': 'MISSING'})
+                    continue
+                counts['runningCount'] = min(counts['desiredCount'], counts['runningCount'] + self.tasks_started_per_describe)
+                found.append(self._service_description(cluster, service_name))
+        return self._respond('DescribeServices', {'services': found, 'failures': failures})
+
+    def update_service(self, cluster, service, desiredCount, **kwargs):
+        with self._lock:
+            counts = self.services.setdefault((cluster, service), {'desiredCount': 0, 'runningCount': 0})
+            counts['desiredCount'] = desiredCount
+            description = self._service_description(cluster, service)
+        return self._respond('UpdateService', {'service': description})
+
+class SimulatedSsmClient(SimulatedClient):
+    service_name = 'ssm'
+
+    def __init__(self, fleet, latency_seconds=0.0, parameters=None):
+        super().__init__(fleet, latency_seconds)
+        self.parameters = dict(parameters or {})
+
+    def get_parameter(self, Name, WithDecryption=False, **kwargs):
+        if Name not in self.parameters:
+            raise ClientError({'Error': {'Code': 'ParameterNotFound', 'Message': f"Parameter {Name} not found."}}, 'GetParameter')
+        return self._respond('GetParameter', {'Parameter': {'Name': Name, 'Type': 'String', 'Value': self.parameters[Name]}})
+
+class SimulatedSnsClient(SimulatedClient):
+    service_name = 'sns'
+
+    def __init__(self, fleet, latency_seconds=0.0):
+        super().__init__(fleet, latency_seconds)
+        self.messages = []
+
+    def publish(self, TopicArn, Message, Subject=None, **kwargs):
+        with self._lock:
+            self.messages.append((TopicArn, Subject, Message))
+            message_id = f"sim-{len(self.messages)}"
+        return self._respond('Publish', {'MessageId': message_id})
@@ -58,13 +58,13 @@ def get_target_group_arns_from_alb(alb_arn):
                 for action in rule.get('Actions', []):
                     if action['Type'] == 'forward' and 'TargetGroupArn' in action:
                         target_group_arns.add(action['TargetGroupArn'])
-                        logger.debug(f"Found target group ARN: '{action['TargetGroupArn']}' from rule: '{rule['RuleArn']}'")
+                        logger.debug("Found target group ARN: '%s' from rule: '%s'", action['TargetGroupArn'], rule['RuleArn'])
                     # Handle weighted target groups (if applicable)
                     elif action['Type'] == 'forward' and 'TargetGroupStickinessConfig' in action and 'TargetGroups' in action['ForwardConfig']:
                          for tg_in_forward in action['ForwardConfig']['TargetGroups']:
                              if 'TargetGroupArn' in tg_in_forward:
                                  target_group_arns.add(tg_in_forward['TargetGroupArn'])
-                                 logger.debug(f"Found target group ARN (weighted): '{tg_in_forward['TargetGroupArn']}' from rule: '{rule['RuleArn']}'")
+                                 logger.debug("Found target group ARN (weighted): '%s' from rule: '%s'", tg_in_forward['TargetGroupArn'], rule['RuleArn'])
 
         logger.info(f"Finished collecting target group ARNs. Total unique ARNs found: {len(target_group_arns)}")
         return list(target_group_arns) # Convert set to list for consistent return type
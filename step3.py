@@ -4,12 +4,15 @@ import logging
 import boto3
 from botocore.exceptions import ClientError
 
+from request_coalescing import coalescing_client, reset_invocation_cache
+from structured_logging import target_detail_enabled, sample_target_detail
+
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper()) # Set to 'DEBUG' for more verbosity during testing
 
 # Initialize the ELBv2 client (boto3 is synchronous by default)
-elbv2_client = boto3.client('elbv2')
+elbv2_client = coalescing_client(boto3.client('elbv2')) # Identical describe calls are shared per invocation
 
 def get_load_balancer_arn(load_balancer_name):
     """
@@ -47,7 +50,7 @@ def get_target_group_arns_from_alb(alb_arn):
 
         for listener in listeners_response.get('Listeners', []):
             listener_arn = listener['ListenerArn']
-            logger.debug(f"Found listener: '{listener_arn}'") # Changed to debug
+            logger.debug("Found listener: '%s'", listener_arn) # Changed to debug
 
             # Describe rules for each listener to get target groups
             # This includes the default rule which always has a target group action
@@ -57,13 +60,13 @@ def get_target_group_arns_from_alb(alb_arn):
                 for action in rule.get('Actions', []):
                     if action['Type'] == 'forward' and 'TargetGroupArn' in action:
                         target_group_arns.add(action['TargetGroupArn'])
-                        logger.debug(f"Found target group ARN: '{action['TargetGroupArn']}' from rule: '{rule['RuleArn']}'")
+                        logger.debug("Found target group ARN: '%s' from rule: '%s'", action['TargetGroupArn'], rule['RuleArn'])
                     # Handle weighted target groups (if applicable)
                     elif action['Type'] == 'forward' and 'TargetGroupStickinessConfig' in action and 'TargetGroups' in action['ForwardConfig']:
                          for tg_in_forward in action['ForwardConfig']['TargetGroups']:
                              if 'TargetGroupArn' in tg_in_forward:
                                  target_group_arns.add(tg_in_forward['TargetGroupArn'])
-                                 logger.debug(f"Found target group ARN (weighted): '{tg_in_forward['TargetGroupArn']}' from rule: '{rule['RuleArn']}'")
+                                 logger.debug("Found target group ARN (weighted): '%s' from rule: '%s'", tg_in_forward['TargetGroupArn'], rule['RuleArn'])
 
         logger.info(f"Finished collecting target group ARNs. Total unique ARNs found: {len(target_group_arns)}")
         return list(target_group_arns) # Convert set to list for consistent return type
@@ -85,12 +88,14 @@ def is_target_group_healthy(target_group_arn):
 
         healthy_targets_count = 0
         total_targets_count = 0
+        log_target_detail = target_detail_enabled()
 
         for target_health in health_response.get('TargetHealthDescriptions', []):
             total_targets_count += 1
             state = target_health['TargetHealth']['State']
             target_id = target_health['Target']['Id']
-            logger.debug(f"Target '{target_id}' state: '{state}' (Target Group: '{target_group_arn}')")
+            if log_target_detail and sample_target_detail():
+                logger.debug("Target '%s' state: '%s' (Target Group: '%s')", target_id, state, target_group_arn)
 
             if state == 'healthy':
                 healthy_targets_count += 1
@@ -117,6 +122,7 @@ def handler(event, context):
     Lambda function entry point to retrieve ALB ARN, Target Group ARNs,
     and check health of one sample target group.
     """
+    reset_invocation_cache() # Start every invocation with fresh describe results
     load_balancer_name = os.environ.get('LOAD_BALANCER_NAME')
 
     if not load_balancer_name:
@@ -1,16 +1,28 @@
 import os
 import json
 import logging
+from collections import Counter
 import boto3
 from botocore.exceptions import ClientError
 
+from request_coalescing import coalescing_client, reset_invocation_cache
+from health_aggregation import summarize_group_counts
+from structured_logging import RunSummary, target_detail_enabled, sample_target_detail
+from metric_publisher import MetricPublisher, publisher_client_config
+from health_timeseries import record_health_samples
+
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper()) # Set to 'DEBUG' for more verbosity during testing
 
 # Initialize AWS clients
-elbv2_client = boto3.client('elbv2')
-cloudwatch_client = boto3.client('cloudwatch')
+elbv2_client = coalescing_client(boto3.client('elbv2')) # Identical describe calls are shared per invocation
+cloudwatch_client = boto3.client('cloudwatch', config=publisher_client_config)
+metric_publisher = MetricPublisher(cloudwatch_client) # Sends in the background; drained before the handler returns
+
+# (healthy, total) target counts per target group from the previous warm invocation;
+# a healthy group's DEBUG verdict is only logged again when its counts change
+previous_group_counts = {}
 
 # --- Helper Functions ---
 
@@ -50,7 +62,7 @@ def get_target_group_arns_from_alb(alb_arn):
 
         for listener in listeners_response.get('Listeners', []):
             listener_arn = listener['ListenerArn']
-            logger.debug(f"Found listener: '{listener_arn}'")
+            logger.debug("Found listener: '%s'", listener_arn)
 
             # Describe rules for each listener to get target groups
             rules_response = elbv2_client.describe_rules(ListenerArn=listener_arn)
@@ -59,12 +71,12 @@ def get_target_group_arns_from_alb(alb_arn):
                 for action in rule.get('Actions', []):
                     if action['Type'] == 'forward' and 'TargetGroupArn' in action:
                         target_group_arns.add(action['TargetGroupArn'])
-                        logger.debug(f"Found target group ARN: '{action['TargetGroupArn']}' from rule: '{rule['RuleArn']}'")
+                        logger.debug("Found target group ARN: '%s' from rule: '%s'", action['TargetGroupArn'], rule['RuleArn'])
                     elif action['Type'] == 'forward' and 'TargetGroupStickinessConfig' in action and 'TargetGroups' in action['ForwardConfig']:
                          for tg_in_forward in action['ForwardConfig']['TargetGroups']:
                              if 'TargetGroupArn' in tg_in_forward:
                                  target_group_arns.add(tg_in_forward['TargetGroupArn'])
-                                 logger.debug(f"Found target group ARN (weighted): '{tg_in_forward['TargetGroupArn']}' from rule: '{rule['RuleArn']}'")
+                                 logger.debug("Found target group ARN (weighted): '%s' from rule: '%s'", tg_in_forward['TargetGroupArn'], rule['RuleArn'])
 
         logger.info(f"Finished collecting target group ARNs. Total unique ARNs found: {len(target_group_arns)}")
         return list(target_group_arns) # Convert set to list for consistent return type
@@ -75,65 +87,78 @@ def get_target_group_arns_from_alb(alb_arn):
         logger.error(f"An unexpected error occurred in get_target_group_arns_from_alb: {e}", exc_info=True)
         raise
 
+def get_target_health_descriptions(target_group_arn):
+    """
+    Retrieves the TargetHealthDescriptions of a target group.
+    """
+    try:
+        logger.debug("Describing target health for: '%s'", target_group_arn)
+        health_response = elbv2_client.describe_target_health(TargetGroupArn=target_group_arn)
+        return health_response.get('TargetHealthDescriptions', [])
+    except ClientError as e:
+        logger.error(f"AWS API Error describing target health for '{target_group_arn}': {e}")
+        raise
+    except Exception as e:
+        logger.error(f"An unexpected error occurred in get_target_health_descriptions: {e}", exc_info=True)
+        raise
+
+def log_target_group_verdict(target_group_arn, healthy_targets_count, total_targets_count):
+    """
+    Logs and returns the verdict for a target group: healthy when it has at least one healthy target.
+    """
+    if total_targets_count == 0:
+        logger.warning("Target Group '%s' has no registered targets.", target_group_arn)
+        return False # No targets means not healthy in this context
+    elif healthy_targets_count > 0:
+        # Healthy groups are only counted in the run summary unless DEBUG is enabled
+        logger.debug("Target Group '%s' is HEALTHY (%d/%d healthy targets).", target_group_arn, healthy_targets_count, total_targets_count)
+        return True
+    else:
+        logger.warning("Target Group '%s' is UNHEALTHY (0/%d healthy targets).", target_group_arn, total_targets_count)
+        return False
+
 def is_target_group_healthy(target_group_arn):
     """
     Checks if a target group has at least one healthy target.
     Returns True if healthy, False otherwise.
     """
     try:
-        logger.debug(f"Describing target health for: '{target_group_arn}'")
-        health_response = elbv2_client.describe_target_health(TargetGroupArn=target_group_arn)
+        descriptions = get_target_health_descriptions(target_group_arn)
+        detail_enabled = target_detail_enabled()
 
         healthy_targets_count = 0
-        total_targets_count = 0
-
-        for target_health in health_response.get('TargetHealthDescriptions', []):
-            total_targets_count += 1
+        for target_health in descriptions:
             state = target_health['TargetHealth']['State']
-            target_id = target_health['Target']['Id']
-            logger.debug(f"Target '{target_id}' state: '{state}' (Target Group: '{target_group_arn}')")
-
+            if detail_enabled and sample_target_detail():
+                logger.debug("Target '%s' state: '%s' (Target Group: '%s')", target_health['Target']['Id'], state, target_group_arn)
             if state == 'healthy':
                 healthy_targets_count += 1
 
-        if total_targets_count == 0:
-            logger.warning(f"Target Group '{target_group_arn}' has no registered targets.")
-            return False # No targets means not healthy in this context
-        elif healthy_targets_count > 0:
-            logger.info(f"Target Group '{target_group_arn}' is HEALTHY ({healthy_targets_count}/{total_targets_count} healthy targets).")
-            return True
-        else:
-            logger.warning(f"Target Group '{target_group_arn}' is UNHEALTHY (0/{total_targets_count} healthy targets).")
-            return False
+        return log_target_group_verdict(target_group_arn, healthy_targets_count, len(descriptions))
 
-    except ClientError as e:
-        logger.error(f"AWS API Error describing target health for '{target_group_arn}': {e}")
-        raise
+    except ClientError:
+        raise # Already logged by get_target_health_descriptions
     except Exception as e:
         logger.error(f"An unexpected error occurred in is_target_group_healthy: {e}", exc_info=True)
         raise
 
 def publish_cloudwatch_metric(namespace, metric_name, value, unit, dimensions):
     """
-    Publishes a custom metric to CloudWatch.
+    Queues a custom metric for the background publisher. Call
+    metric_publisher.flush() before returning from the handler.
     """
-    try:
-        cloudwatch_client.put_metric_data(
-            Namespace=namespace,
-            MetricData=[
-                {
-                    'MetricName': metric_name,
-                    'Dimensions': dimensions,
-                    'Value': float(value),
-                    'Unit': unit
-                },
-            ]
-        )
-        logger.info(f"Published metric '{metric_name}' (Value: {value}, Unit: {unit}) to namespace '{namespace}' with dimensions {dimensions}")
-    except ClientError as e:
-        logger.error(f"AWS API Error publishing CloudWatch metric '{metric_name}': {e}")
-    except Exception as e:
-        logger.error(f"An unexpected error occurred while publishing CloudWatch metric: {e}", exc_info=True)
+    metric_publisher.put(
+        namespace,
+        [
+            {
+                'MetricName': metric_name,
+                'Dimensions': dimensions,
+                'Value': float(value),
+                'Unit': unit
+            },
+        ]
+    )
+    logger.info(f"Queued metric '{metric_name}' (Value: {value}, Unit: {unit}) for namespace '{namespace}' with dimensions {dimensions}")
 
 
 # --- Main Lambda Handler ---
@@ -143,6 +168,7 @@ def handler(event, context):
     Lambda function entry point to perform comprehensive ALB health check
     and publish a binary health metric to CloudWatch.
     """
+    reset_invocation_cache() # Start every invocation with fresh describe results
     load_balancer_name = os.environ.get('LOAD_BALANCER_NAME')
     healthy_threshold_percentage_str = os.environ.get('HEALTHY_THRESHOLD_PERCENTAGE', '75')
     
@@ -173,12 +199,16 @@ def handler(event, context):
     status_code = 500
 
     alb_arn = None # Initialize alb_arn outside try block for later use
+    summary = RunSummary('step5.handler') # Emitted once as a single JSON record
+    summary.set(alb_name=load_balancer_name, threshold_percentage=healthy_threshold_percentage)
 
     try:
         # Step 1: Get ALB ARN
         alb_arn = get_load_balancer_arn(load_balancer_name)
         if not alb_arn:
             logger.error(f"ALB '{load_balancer_name}' not found. Cannot proceed with health check.")
+            summary.set(overall_status="ALB_NOT_FOUND", published_binary_health_value=0)
+            record_health_samples([('alb', load_balancer_name, False, 0.0)])
             # Publish 0 for BinaryHealthCheck if ALB not found (no dimensions)
             publish_cloudwatch_metric(
                 cloudwatch_namespace,
@@ -197,19 +227,57 @@ def handler(event, context):
 
         healthy_tg_count = 0
         total_tg_count = len(target_group_arns)
+        healthy_capacity_percentage = 100.0
+        healthy_ratio_percentiles = {}
+        timeseries_samples = [] # Per target group samples for the health history
 
         if total_tg_count == 0:
             logger.warning(f"No target groups found for ALB '{load_balancer_name}'. Considering 100% healthy (no TGs).")
             healthy_percentage = 100.0
         else:
-            # Step 3: Check health of each target group
+            # Step 3: Count healthy targets in each target group with the plain loop. Unhealthy
+            # and empty groups are logged every run; healthy verdicts only when the counts changed
+            # since the previous warm invocation
+            group_counts = {}
+            state_counts = Counter() # Targets per state across the fleet
             for tg_arn in target_group_arns:
-                if is_target_group_healthy(tg_arn):
-                    healthy_tg_count += 1
+                descriptions = get_target_health_descriptions(tg_arn)
+                healthy_targets_count = 0
+                for target_health in descriptions:
+                    state = target_health['TargetHealth']['State']
+                    if state == 'healthy':
+                        healthy_targets_count += 1
+                    else:
+                        state_counts[state] += 1 # Only the rarer non-healthy states are counted per target
+                state_counts['healthy'] += healthy_targets_count
+                counts = (healthy_targets_count, len(descriptions))
+                group_counts[tg_arn] = counts
+                counts_changed = previous_group_counts.get(tg_arn) != counts
+                if counts_changed:
+                    summary.incr('changed_target_groups')
+                if counts_changed or not healthy_targets_count:
+                    log_target_group_verdict(tg_arn, *counts)
+                if not healthy_targets_count:
+                    summary.append('unhealthy_target_groups', tg_arn)
+            previous_group_counts.clear()
+            previous_group_counts.update(group_counts)
+
+            # Capacity and ratio percentiles come from the counts alone, in pure Python
+            fleet_health = summarize_group_counts(group_counts, state_counts)
+            timeseries_samples.extend(
+                ('target_group', tg_arn, healthy_targets_count > 0, fleet_health['healthy_ratios'][tg_arn] * 100.0)
+                for tg_arn, (healthy_targets_count, _) in group_counts.items()
+            )
 
-            healthy_percentage = (healthy_tg_count / total_tg_count) * 100
+            healthy_tg_count = fleet_health['healthy_group_count']
+            healthy_capacity_percentage = fleet_health['healthy_capacity_percentage']
+            healthy_ratio_percentiles = fleet_health['healthy_ratio_percentiles']
+            summary.set(
+                target_states=fleet_health['state_counts'],
+                healthy_target_ratio_percentiles=healthy_ratio_percentiles
+            )
 
-        logger.info(f"Overall ALB health: {healthy_tg_count}/{total_tg_count} target groups healthy ({healthy_percentage:.2f}%).")
+            healthy_percentage = (healthy_tg_count / total_tg_count) * 100
 
         # Determine overall status and binary metric value
         if healthy_percentage >= healthy_threshold_percentage:
@@ -220,7 +288,16 @@ def handler(event, context):
             overall_status = "UNHEALTHY"
             status_code = 500
             binary_health_metric_value = 0 # 0 means unhealthy
-            logger.error(f"ALB health ({healthy_percentage:.2f}%) is below threshold ({healthy_threshold_percentage}%).")
+            logger.error("ALB health (%.2f%%) is below threshold (%s%%).", healthy_percentage, healthy_threshold_percentage)
+
+        summary.set(
+            total_target_groups=total_tg_count,
+            healthy_target_groups=healthy_tg_count,
+            healthy_percentage=round(healthy_percentage, 2),
+            healthy_capacity_percentage=round(healthy_capacity_percentage, 2),
+            overall_status=overall_status,
+            published_binary_health_value=binary_health_metric_value
+        )
 
         # Publish the BinaryHealthCheck metric (no dimensions)
         publish_cloudwatch_metric(
@@ -230,6 +307,8 @@ def handler(event, context):
             'Count', # Unit remains 'Count'
             [] # <--- NO DIMENSIONS HERE
         )
+        # Local health history (a no-op unless HEALTH_TIMESERIES_DIR is set), written while the metric is sent
+        record_health_samples([('alb', load_balancer_name, binary_health_metric_value == 1, healthy_percentage)] + timeseries_samples)
 
         return {
             'statusCode': status_code,
@@ -240,6 +319,8 @@ def handler(event, context):
                 'total_target_groups': total_tg_count,
                 'healthy_target_groups': healthy_tg_count,
                 'healthy_percentage': f"{healthy_percentage:.2f}%",
+                'healthy_capacity_percentage': f"{healthy_capacity_percentage:.2f}%",
+                'healthy_target_ratio_percentiles': healthy_ratio_percentiles,
                 'threshold_percentage': f"{healthy_threshold_percentage}%",
                 'overall_status': overall_status,
                 'published_binary_health_value': binary_health_metric_value,
@@ -249,7 +330,9 @@ def handler(event, context):
 
     except Exception as e:
         logger.error(f"Lambda execution failed during overall health check: {e}", exc_info=True)
-        
+        summary.set(overall_status="ERROR", error=str(e), published_binary_health_value=0)
+        record_health_samples([('alb', load_balancer_name, False, 0.0)])
+
         # Publish 0 to BinaryHealthCheck metric on general failure (no dimensions)
         publish_cloudwatch_metric(
             cloudwatch_namespace,
@@ -262,3 +345,6 @@ def handler(event, context):
             'statusCode': 500,
             'body': json.dumps(f'Internal Server Error: {e}')
         }
+    finally:
+        summary.set(**metric_publisher.flush())
+        summary.emit()
@@ -0,0 +1,72 @@
+import os
+import json
+import random
+import logging
+import time
+
+# Configure logging
+logger = logging.getLogger()
+
+# --- Structured Logging Helpers ---
+# Per-target and per-rule detail is logged with %-style arguments so nothing is
+# formatted unless DEBUG is enabled, and only a sample of targets is logged even
+# then. Each handler run ends with a single JSON summary record instead.
+
+# Fraction (0.0 - 1.0) of per-target detail lines to log when DEBUG is enabled
+LOG_TARGET_SAMPLE_RATE = min(1.0, max(0.0, float(os.environ.get('LOG_TARGET_SAMPLE_RATE', '1.0'))))
+
+# Cap on list-valued summary fields (e.g. unhealthy target groups) so a bad minute
+# cannot produce a multi-kilobyte record
+MAX_SUMMARY_LIST_ITEMS = int(os.environ.get('MAX_SUMMARY_LIST_ITEMS', '20'))
+
+def target_detail_enabled():
+    """
+    True when per-target detail may be logged at all. Check once per group, before
+    the per-target loop, so disabled DEBUG costs a single comparison.
+    """
+    return LOG_TARGET_SAMPLE_RATE > 0.0 and logger.isEnabledFor(logging.DEBUG)
+
+def sample_target_detail():
+    """
+    True for roughly LOG_TARGET_SAMPLE_RATE of calls.
+    """
+    return LOG_TARGET_SAMPLE_RATE >= 1.0 or random.random() < LOG_TARGET_SAMPLE_RATE
+
+class LazyJson:
+    """
+    Defers json.dumps until a log record is actually formatted.
+    """
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return json.dumps(self.value, default=str)
+
+class RunSummary:
+    """
+    Accumulates the facts of one handler run and emits them as one JSON record.
+    """
+
+    def __init__(self, handler_name):
+        self.started = time.perf_counter()
+        self.fields = {'summary': handler_name}
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def incr(self, name, amount=1):
+        self.fields[name] = self.fields.get(name, 0) + amount
+
+    def append(self, name, item):
+        items = self.fields.setdefault(name, [])
+        if len(items) < MAX_SUMMARY_LIST_ITEMS:
+            items.append(item)
+        else:
+            self.incr(f"{name}_truncated")
+
+    def emit(self, level=logging.INFO):
+        self.fields['duration_ms'] = round((time.perf_counter() - self.started) * 1000.0, 2)
+        logger.log(level, "%s", LazyJson(self.fields))
@@ -0,0 +1,169 @@
+import os
+import json
+from datetime import datetime, timezone
+
+import pytest
+from botocore.exceptions import ClientError
+
+# adaptive_scheduler creates its boto3 client at import time
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+import adaptive_scheduler
+from adaptive_scheduler import choose_next_interval, get_pending_schedule
+
+# --- Unit tests for the adaptive interval choice and the watchdog schedule check ---
+# Run with `pytest test_adaptive_scheduler.py` (see test_healthcheck.py for why not `python -m pytest`).
+
+NOW = 1_800_000_000
+
+def entries(*points):
+    """
+    Builds history records from (seconds after NOW, healthy percentage, interval) points.
+    """
+    return [{'t': NOW + offset, 'p': percentage, 'i': interval} for offset, percentage, interval in points]
+
+class FakeClock:
+    """
+    Stands in for the time module: sleep advances the clock instead of blocking.
+    """
+
+    def __init__(self, now=NOW):
+        self.now = float(now)
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+class ResourceNotFoundException(ClientError):
+    pass
+
+class FakeSchedulerClient:
+    """
+    EventBridge Scheduler stand-in holding at most one schedule.
+    """
+
+    exceptions = type('exceptions', (), {'ResourceNotFoundException': ResourceNotFoundException})
+
+    def __init__(self, schedule=None):
+        self.schedule = schedule
+        self.calls = []
+
+    def get_schedule(self, Name, GroupName):
+        self.calls.append('get_schedule')
+        if self.schedule is None:
+            raise ResourceNotFoundException({'Error': {'Code': 'ResourceNotFoundException', 'Message': 'Not found'}}, 'GetSchedule')
+        return dict(self.schedule)
+
+    def update_schedule(self, **schedule):
+        self.calls.append('update_schedule')
+        self.schedule = schedule
+
+def at_schedule(seconds_from_now, history, state='ENABLED'):
+    at = datetime.fromtimestamp(NOW + seconds_from_now, timezone.utc)
+    return {
+        'ScheduleExpression': f"at({at.strftime('%Y-%m-%dT%H:%M:%S')})",
+        'State': state,
+        'Target': {'Input': json.dumps({'adaptive_history': history})}
+    }
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(adaptive_scheduler, 'time', fake)
+    return fake
+
+# --- choose_next_interval ---
+
+def test_below_threshold_checks_at_the_minimum_interval():
+    assert choose_next_interval(entries((0, 100.0, 900), (60, 50.0, None))) == (adaptive_scheduler.MIN_CHECK_INTERVAL_SECONDS, 'below_threshold')
+
+def test_near_threshold_checks_at_the_minimum_interval():
+    assert choose_next_interval(entries((0, 80.0, None)), threshold_percentage=75.0) == (adaptive_scheduler.MIN_CHECK_INTERVAL_SECONDS, 'near_threshold')
+
+def test_falling_checks_twice_before_the_projected_crossing():
+    # -10 points per 120s from 90%: 180s to reach 75%, so check again in 90s
+    history = entries((0, 100.0, 120), (60, 95.0, 120), (120, 90.0, None))
+
+    assert choose_next_interval(history, threshold_percentage=75.0) == (90, 'falling')
+
+def test_falling_fast_is_clamped_to_the_minimum_interval():
+    history = entries((0, 100.0, 120), (10, 90.0, None))
+
+    assert choose_next_interval(history, threshold_percentage=75.0) == (adaptive_scheduler.MIN_CHECK_INTERVAL_SECONDS, 'falling')
+
+def test_steady_doubles_the_previous_interval_up_to_the_maximum():
+    doubled = choose_next_interval(entries((0, 100.0, 120), (120, 100.0, 120), (240, 100.0, None)))
+    capped = choose_next_interval(entries((0, 100.0, 480), (480, 100.0, 600), (1080, 100.0, None)))
+
+    assert doubled == (240, 'steady')
+    assert capped == (adaptive_scheduler.MAX_CHECK_INTERVAL_SECONDS, 'steady')
+
+def test_short_steady_history_uses_the_default_interval():
+    assert choose_next_interval(entries((0, 100.0, None))) == (adaptive_scheduler.DEFAULT_CHECK_INTERVAL_SECONDS, 'default')
+
+# --- get_pending_schedule ---
+
+def test_future_schedule_is_pending_with_its_history(clock, monkeypatch):
+    history = entries((0, 100.0, 900))
+    monkeypatch.setattr(adaptive_scheduler, 'scheduler_client', FakeSchedulerClient(at_schedule(600, history)))
+
+    next_check_at, recovered = get_pending_schedule()
+
+    assert next_check_at.timestamp() == NOW + 600
+    assert recovered == history
+
+def test_recently_due_schedule_is_pending_within_the_grace_period(clock, monkeypatch):
+    monkeypatch.setattr(adaptive_scheduler, 'scheduler_client', FakeSchedulerClient(at_schedule(-30, [])))
+
+    assert get_pending_schedule()[0] is not None
+
+def test_overdue_schedule_is_not_pending_but_keeps_its_history(clock, monkeypatch):
+    history = entries((0, 100.0, 900))
+    monkeypatch.setattr(adaptive_scheduler, 'scheduler_client', FakeSchedulerClient(at_schedule(-adaptive_scheduler.WATCHDOG_GRACE_SECONDS - 60, history)))
+
+    assert get_pending_schedule() == (None, history)
+
+def test_disabled_or_missing_schedule_is_not_pending(clock, monkeypatch):
+    monkeypatch.setattr(adaptive_scheduler, 'scheduler_client', FakeSchedulerClient(at_schedule(600, [], state='DISABLED')))
+    assert get_pending_schedule()[0] is None
+
+    monkeypatch.setattr(adaptive_scheduler, 'scheduler_client', FakeSchedulerClient())
+    assert get_pending_schedule() == (None, [])
+
+# --- handler ---
+
+@pytest.fixture
+def healthy_check(monkeypatch):
+    calls = []
+
+    def check(event, context):
+        calls.append(event)
+        return {'statusCode': 200, 'body': json.dumps({'healthy_percentage': '100.00%'})}
+    monkeypatch.setattr(adaptive_scheduler, 'resolve_check_handler', lambda check_handler: check)
+    return calls
+
+def test_watchdog_run_leaves_a_pending_schedule_alone(clock, monkeypatch, healthy_check):
+    scheduler = FakeSchedulerClient(at_schedule(600, entries((0, 100.0, 900))))
+    monkeypatch.setattr(adaptive_scheduler, 'scheduler_client', scheduler)
+    monkeypatch.setattr(adaptive_scheduler, 'ADAPTIVE_SCHEDULE_MODE', 'reschedule')
+
+    body = json.loads(adaptive_scheduler.handler({}, None)['body'])
+
+    assert body['checks_run'] == 0
+    assert healthy_check == []
+    assert scheduler.calls == ['get_schedule']
+
+def test_loop_mode_without_context_stops_at_the_max_duration(clock, monkeypatch, healthy_check):
+    monkeypatch.setattr(adaptive_scheduler, 'ADAPTIVE_SCHEDULE_MODE', 'loop')
+    monkeypatch.setattr(adaptive_scheduler, 'ADAPTIVE_LOOP_MAX_SECONDS', 1800.0)
+    monkeypatch.setattr(adaptive_scheduler, '_history', [])
+
+    body = json.loads(adaptive_scheduler.handler({}, None)['body'])
+
+    assert 1 < body['checks_run'] < 20
+    assert clock.now - NOW <= 1800.0
@@ -0,0 +1,168 @@
+import json
+import asyncio
+import http.client
+
+import pytest
+
+from health_daemon import HealthDaemon
+
+# --- Tests for the health daemon's HTTP endpoint on an ephemeral localhost port ---
+# Run with `pytest test_health_daemon.py` (see test_healthcheck.py for why not `python -m pytest`).
+
+class ScriptedEvaluator:
+    """
+    Evaluator returning a fixed Lambda-style response; set status_code to flip the verdict.
+    """
+
+    __name__ = 'scripted'
+
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+
+    def __call__(self, event, context):
+        return {'statusCode': self.status_code, 'body': json.dumps({'healthy_percentage': '100.00%' if self.status_code == 200 else '0.00%'})}
+
+def request(port, method, path, headers=None):
+    """
+    Sends one request with http.client and returns (status, headers, body).
+    """
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    try:
+        connection.request(method, path, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, {name.lower(): value for name, value in response.getheaders()}, response.read()
+    finally:
+        connection.close()
+
+@pytest.fixture
+def run_daemon():
+    """
+    Returns run(scenario, status_code=200): serves a HealthDaemon on an ephemeral
+    port and calls scenario(daemon, evaluator, port) as a coroutine.
+    """
+    def run(scenario, status_code=200):
+        evaluator = ScriptedEvaluator(status_code)
+        daemon = HealthDaemon(evaluator, interval_seconds=3600)
+
+        async def main():
+            server = await asyncio.start_server(daemon.handle_connection, '127.0.0.1', 0)
+            async with server:
+                return await scenario(daemon, evaluator, server.sockets[0].getsockname()[1])
+        return asyncio.run(main())
+    return run
+
+def test_health_is_pending_before_the_first_evaluation(run_daemon):
+    async def scenario(daemon, evaluator, port):
+        return await asyncio.to_thread(request, port, 'GET', '/health')
+
+    status, _, body = run_daemon(scenario)
+
+    assert status == 503
+    assert json.loads(body)['status'] == 'PENDING'
+
+def test_health_reports_the_latest_verdict(run_daemon):
+    async def scenario(daemon, evaluator, port):
+        await daemon.evaluate_once()
+        healthy = await asyncio.to_thread(request, port, 'GET', '/health')
+        evaluator.status_code = 500
+        await daemon.evaluate_once()
+        unhealthy = await asyncio.to_thread(request, port, 'GET', '/health')
+        return healthy, unhealthy
+
+    healthy, unhealthy = run_daemon(scenario)
+
+    assert healthy[0] == 200
+    assert json.loads(healthy[2]) == {'status': 'HEALTHY'}
+    assert unhealthy[0] == 503
+    assert json.loads(unhealthy[2]) == {'status': 'UNHEALTHY'}
+
+def test_health_detail_includes_the_handler_result(run_daemon):
+    async def scenario(daemon, evaluator, port):
+        await daemon.evaluate_once()
+        return await asyncio.to_thread(request, port, 'GET', '/health/detail?verbose=1')
+
+    status, headers, body = run_daemon(scenario)
+    detail = json.loads(body)
+
+    assert status == 200
+    assert headers['content-type'] == 'application/json'
+    assert detail['status'] == 'HEALTHY'
+    assert detail['evaluator'] == 'scripted'
+    assert detail['evaluations'] == 1
+    assert detail['handler_status_code'] == 200
+    assert detail['result'] == {'healthy_percentage': '100.00%'}
+
+def test_matching_etag_returns_304_while_healthy(run_daemon):
+    async def scenario(daemon, evaluator, port):
+        await daemon.evaluate_once()
+        first = await asyncio.to_thread(request, port, 'GET', '/health')
+        revalidated = await asyncio.to_thread(request, port, 'GET', '/health', {'If-None-Match': first[1]['etag']})
+        stale = await asyncio.to_thread(request, port, 'GET', '/health', {'If-None-Match': '"stale"'})
+        return first, revalidated, stale
+
+    first, revalidated, stale = run_daemon(scenario)
+
+    assert first[1]['etag'].startswith('"')
+    assert revalidated[0] == 304
+    assert revalidated[1]['etag'] == first[1]['etag']
+    assert revalidated[2] == b''
+    assert stale[0] == 200
+    assert stale[2] == first[2]
+
+def test_matching_etag_returns_full_503_while_unhealthy(run_daemon):
+    async def scenario(daemon, evaluator, port):
+        await daemon.evaluate_once()
+        first = await asyncio.to_thread(request, port, 'GET', '/health')
+        return await asyncio.to_thread(request, port, 'GET', '/health', {'If-None-Match': first[1]['etag']})
+
+    status, _, body = run_daemon(scenario, status_code=500)
+
+    assert status == 503 # A 304 would read as healthy to pollers that accept any 3xx
+    assert json.loads(body) == {'status': 'UNHEALTHY'}
+
+def test_head_advertises_the_get_content_length(run_daemon):
+    async def scenario(daemon, evaluator, port):
+        await daemon.evaluate_once()
+        get = await asyncio.to_thread(request, port, 'GET', '/health/detail')
+        head = await asyncio.to_thread(request, port, 'HEAD', '/health/detail')
+        return get, head
+
+    get, head = run_daemon(scenario)
+
+    assert head[0] == 200
+    assert head[2] == b''
+    assert int(head[1]['content-length']) == len(get[2])
+    assert head[1]['etag'] == get[1]['etag']
+
+def test_unknown_path_and_method(run_daemon):
+    async def scenario(daemon, evaluator, port):
+        missing = await asyncio.to_thread(request, port, 'GET', '/nope')
+        post = await asyncio.to_thread(request, port, 'POST', '/health')
+        return missing, post
+
+    missing, post = run_daemon(scenario)
+
+    assert missing[0] == 404
+    assert post[0] == 405
+
+def test_client_disconnect_during_write_is_not_raised(run_daemon):
+    class ResetWriter:
+        closed = False
+
+        def write(self, data):
+            pass
+
+        async def drain(self):
+            raise ConnectionResetError("Connection reset by peer")
+
+        def close(self):
+            self.closed = True
+
+    async def scenario(daemon, evaluator, port):
+        reader = asyncio.StreamReader()
+        reader.feed_data(b'GET /health HTTP/1.1\r\nHost: localhost\r\n\r\n')
+        writer = ResetWriter()
+        await daemon.handle_connection(reader, writer)
+        return writer
+
+    assert run_daemon(scenario).closed
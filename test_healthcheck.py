@@ -0,0 +1,187 @@
+import os
+import json
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+
+# healthcheck reads its settings and creates boto3 clients at import time
+FLAG_PATH = '/test/switchover-flag'
+ENDPOINTS_PATH = '/test/service-endpoints'
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ['SWITCHOVER_FLAG_SSM_PATH'] = FLAG_PATH
+os.environ['SERVICE_HEALTH_ENDPOINTS_SSM_PATH'] = ENDPOINTS_PATH
+os.environ['SNS_TOPIC_ARN_FOR_ALERTS'] = 'arn:aws:sns:us-east-1:123456789012:test-alerts'
+
+import healthcheck
+from request_coalescing import coalescing_client
+from simulated_backend import SimulatedFleet, SimulatedSsmClient, SimulatedCloudWatchClient, SimulatedSnsClient
+
+# --- Regression tests for healthcheck.lambda_handler against the simulated backend ---
+# Run with `pytest test_healthcheck.py`; `python -m pytest` puts the repository on
+# sys.path first, where code.py shadows the standard library module pytest imports.
+
+class ScriptedSsmClient(SimulatedSsmClient):
+    """
+    Simulated SSM whose reads can be delayed or fail per parameter.
+    """
+
+    def __init__(self, fleet, parameters, errors=None, delays=None):
+        super().__init__(fleet, 0.0, parameters)
+        self.errors = errors or {} # parameter name -> error code
+        self.delays = delays or {} # parameter name -> seconds
+
+    def get_parameter(self, Name, WithDecryption=False, **kwargs):
+        time.sleep(self.delays.get(Name, 0.0))
+        if Name in self.errors:
+            raise ClientError({'Error': {'Code': self.errors[Name], 'Message': 'Simulated failure'}}, 'GetParameter')
+        return super().get_parameter(Name, WithDecryption, **kwargs)
+
+class TimedCloudWatchClient(SimulatedCloudWatchClient):
+    """
+    Simulated CloudWatch that also records when each datum was published.
+    """
+
+    def __init__(self, fleet):
+        super().__init__(fleet)
+        self.published_at = []
+
+    def put_metric_data(self, Namespace, MetricData, **kwargs):
+        self.published_at.extend(time.monotonic() for _ in MetricData)
+        return super().put_metric_data(Namespace, MetricData, **kwargs)
+
+@pytest.fixture
+def run_healthcheck(monkeypatch):
+    """
+    Returns run(flag, probes, ...) which invokes the handler once. probes maps a
+    service name to (healthy, probe_seconds); the result has the response, its
+    parsed body, the published values with their delay after the invocation
+    started, and the SNS messages sent.
+    """
+    def run(flag, probes, errors=None, delays=None, policy=None):
+        fleet = SimulatedFleet(alb_count=0)
+        endpoints = [{'name': name, 'url': f"http://{name}.internal/health"} for name in probes]
+        ssm = ScriptedSsmClient(fleet, {FLAG_PATH: flag, ENDPOINTS_PATH: json.dumps(endpoints)}, errors, delays)
+        cloudwatch = TimedCloudWatchClient(fleet)
+        sns = SimulatedSnsClient(fleet)
+
+        def check_service_health(service_name, url, timeout=5):
+            healthy, probe_seconds = probes[service_name]
+            time.sleep(probe_seconds)
+            return healthy
+
+        monkeypatch.setattr(healthcheck, 'ssm_client', coalescing_client(ssm))
+        monkeypatch.setattr(healthcheck, 'cloudwatch_client', cloudwatch)
+        monkeypatch.setattr(healthcheck, 'sns_client', sns)
+        monkeypatch.setattr(healthcheck, 'check_service_health', check_service_health)
+        if policy is not None:
+            monkeypatch.setattr(healthcheck, 'FORCED_FLAG_PROBE_POLICY', policy)
+
+        started = time.monotonic()
+        response = healthcheck.lambda_handler({}, None)
+        return {
+            'response': response,
+            'body': json.loads(response['body']),
+            'published': [(datum['Value'], published_at - started) for (_, datum), published_at in zip(cloudwatch.published, cloudwatch.published_at)],
+            'messages': sns.messages
+        }
+    return run
+
+def published_values(result):
+    return [value for value, _ in result['published']]
+
+def test_auto_all_healthy_publishes_1(run_healthcheck):
+    result = run_healthcheck('auto', {'api': (True, 0.0), 'web': (True, 0.0)})
+
+    assert result['response']['statusCode'] == 200
+    assert published_values(result) == [1.0]
+    assert result['body']['actual_health_check_result'] == 1
+    assert result['messages'][0][1] == "Health Check Info: Automated Health Check Passed"
+
+def test_auto_publishes_0_on_first_failed_probe(run_healthcheck):
+    result = run_healthcheck('auto', {
+        'api': (False, 0.0),
+        'web': (False, 0.3),
+        'worker': (True, 0.5)
+    })
+
+    assert result['response']['statusCode'] == 500
+    assert published_values(result) == [0.0] # Published once, not again at the end
+    assert result['published'][0][1] < 0.25 # Did not wait for the slower probes
+    subject, message = result['messages'][0][1:]
+    assert subject == "Health Check Alert: CRITICAL - Automated Health Check Failed"
+    # The remaining probes still complete the failed-services list
+    assert "Failed: api at http://api.internal/health" in message
+    assert "Failed: web at http://web.internal/health" in message
+    assert "worker" not in message
+
+def test_force_healthy_publishes_1_despite_failed_probes(run_healthcheck):
+    result = run_healthcheck('force_healthy', {'api': (False, 0.0)})
+
+    assert result['response']['statusCode'] == 200
+    assert published_values(result) == [1.0]
+    assert result['body']['switchover_flag_mode'] == 'force_healthy'
+    assert result['messages'][0][1] == "Health Check Info: Status Forced Healthy"
+
+def test_force_unhealthy_publishes_0_despite_healthy_probes(run_healthcheck):
+    result = run_healthcheck('FORCE_UNHEALTHY', {'api': (True, 0.0)})
+
+    assert result['response']['statusCode'] == 500
+    assert published_values(result) == [0.0]
+    assert result['body']['switchover_flag_mode'] == 'force_unhealthy'
+    assert result['messages'][0][1] == "Health Check Alert: CRITICAL - Status Forced Unhealthy"
+
+def test_invalid_flag_publishes_0(run_healthcheck):
+    result = run_healthcheck('maybe', {'api': (True, 0.0)})
+
+    assert result['response']['statusCode'] == 500
+    assert published_values(result) == [0.0]
+    assert result['messages'][0][1] == "Health Check Alert: CRITICAL - Invalid Switchover Flag"
+
+def test_failed_flag_read_publishes_0(run_healthcheck):
+    result = run_healthcheck('force_healthy', {'api': (True, 0.0)}, errors={FLAG_PATH: 'AccessDeniedException'})
+
+    assert result['response']['statusCode'] == 500
+    assert published_values(result) == [0.0]
+    assert result['body']['switchover_flag_mode'] is None
+    assert result['messages'][0][1] == "Health Check Alert: CRITICAL - AWS API Error"
+
+def test_failed_endpoints_read_in_auto_publishes_0(run_healthcheck):
+    result = run_healthcheck('auto', {'api': (True, 0.0)}, errors={ENDPOINTS_PATH: 'ParameterNotFound'})
+
+    assert result['response']['statusCode'] == 500
+    assert published_values(result) == [0.0]
+    assert result['messages'][0][1] == "Health Check Alert: CRITICAL - AWS API Error"
+
+def test_forced_flag_publishes_before_slow_endpoints_read(run_healthcheck):
+    result = run_healthcheck('force_unhealthy', {'api': (True, 0.0)}, delays={ENDPOINTS_PATH: 1.0}, policy='skip')
+
+    assert published_values(result) == [0.0]
+    assert result['published'][0][1] < 0.25 # Not held up by the endpoints read
+    assert result['body']['probed_services'] == 0
+
+def test_forced_flag_publishes_before_background_probes(run_healthcheck):
+    result = run_healthcheck('force_unhealthy', {'api': (True, 0.5), 'web': (True, 0.5)}, policy='background')
+
+    assert published_values(result) == [0.0]
+    assert result['published'][0][1] < 0.25
+    assert result['body']['probed_services'] == 2
+    assert result['body']['actual_health_check_result'] == 1
+
+def test_failed_endpoints_read_does_not_override_forced_flag(run_healthcheck):
+    result = run_healthcheck('force_healthy', {'api': (True, 0.0)}, errors={ENDPOINTS_PATH: 'AccessDeniedException'}, policy='skip')
+
+    assert result['response']['statusCode'] == 200
+    assert published_values(result) == [1.0]
+    assert result['body']['switchover_flag_mode'] == 'force_healthy'
+    assert result['body']['actual_health_check_result'] is None
+    subject, message = result['messages'][0][1:]
+    assert subject == "Health Check Info: Status Forced Healthy"
+    assert "NOT EVALUATED (service endpoints unavailable)" in message
+
+def test_sampled_policy_probes_a_sample(run_healthcheck, monkeypatch):
+    monkeypatch.setattr(healthcheck, 'FORCED_FLAG_PROBE_SAMPLE_SIZE', 2)
+    result = run_healthcheck('force_healthy', {f"svc-{index}": (True, 0.0) for index in range(5)}, policy='sampled')
+
+    assert published_values(result) == [1.0]
+    assert result['body']['probed_services'] == 2